@@ -0,0 +1,130 @@
+"""Runs many agent sessions concurrently from a JSON lines task file.
+
+    uv run main.py --batch tasks.jsonl [--output results.jsonl] [--concurrency 4] [--rpm N] [--tpm N]
+
+Each task line is {"prompt": ..., "id": ..., "working_directory": ...}; only prompt is required.
+A task without a working_directory runs in its own copy of the agent's working directory so
+concurrent sessions never see each other's writes. Results are appended to the output file as
+each session finishes.
+"""
+import asyncio
+import json
+import os
+import shutil
+import sys
+import time
+
+from functions.config import CACHE_DIR
+
+DEFAULT_CONCURRENCY = 4
+WORKDIRS = os.path.join(CACHE_DIR, "batch")
+
+
+def load_tasks(path):
+    tasks = []
+    seen = set()
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            task = json.loads(line)
+            if not task.get("prompt"):
+                raise ValueError(f"{path}:{number}: task has no prompt")
+            task.setdefault("id", str(len(tasks)))
+            task_id = str(task["id"])
+            if task_id in ("", ".", "..") or os.path.basename(task_id) != task_id:
+                raise ValueError(f"{path}:{number}: task id {task_id!r} is not a plain name")
+            if task_id in seen:
+                raise ValueError(f"{path}:{number}: duplicate task id {task_id!r}")
+            seen.add(task_id)
+            tasks.append(task)
+    return tasks
+
+
+def prepare_working_directory(task, template):
+    """Return the task's working directory, copying template into a fresh one if it has none."""
+    if task.get("working_directory"):
+        return task["working_directory"]
+    target = os.path.join(WORKDIRS, str(task["id"]))
+    if os.path.dirname(os.path.realpath(target)) != os.path.realpath(WORKDIRS):
+        raise ValueError(f"task id {task['id']!r} does not name a directory under {WORKDIRS}")
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    shutil.copytree(template, target, ignore=shutil.ignore_patterns("__pycache__"))
+    return target
+
+
+async def run_batch(tasks, output_path, concurrency=DEFAULT_CONCURRENCY, rate_limiter=None, verbose=False):
+    """Run tasks with at most concurrency sessions at once; returns the number that failed."""
+    import contextvars
+
+    import main
+    from daemon import SessionStdout
+
+    main.rate_limiter = rate_limiter
+    output = contextvars.ContextVar("batch_output", default=None)
+    queue = asyncio.Queue()
+    for task in tasks:
+        queue.put_nowait(task)
+    failed = 0
+
+    async def run_task(task, results):
+        nonlocal failed
+        started = time.perf_counter()
+        printed = []
+        token = output.set(printed.append)
+        status = "ok"
+        response = None
+        try:
+            working_directory = prepare_working_directory(task, main.WORKING_DIRECTORY)
+            response = await main.run_session_async(main.get_client(), task["prompt"], verbose, working_directory)
+            if response is None:
+                status = "error"
+        except Exception as e:
+            working_directory = task.get("working_directory")
+            printed.append(f"Error: {e}\n")
+            status = "error"
+        output.reset(token)
+        if status != "ok":
+            failed += 1
+
+        results.write(json.dumps({
+            "id": task["id"],
+            "status": status,
+            "response": response,
+            "working_directory": working_directory,
+            "duration_s": round(time.perf_counter() - started, 3),
+            "output": "".join(printed),
+        }) + "\n")
+        results.flush()
+        print(f"[{status}] {task['id']} ({time.perf_counter() - started:.1f}s)")
+
+    async def worker(results):
+        # gather() runs each worker in its own copy of the context, so the output variable
+        # set by run_task belongs to the session currently running on this worker.
+        while not queue.empty():
+            await run_task(queue.get_nowait(), results)
+
+    with open(output_path, "a", encoding="utf-8") as results:
+        console = sys.stdout
+        sys.stdout = SessionStdout(console, output)
+        try:
+            await asyncio.gather(*(worker(results) for _ in range(min(concurrency, len(tasks)))))
+        finally:
+            sys.stdout = console
+    return failed
+
+
+def main(tasks_path, output_path, concurrency, requests_per_minute=None, tokens_per_minute=None, verbose=False):
+    from ratelimit import RateLimiter
+
+    tasks = load_tasks(tasks_path)
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    started = time.perf_counter()
+    print(f"Running {len(tasks)} tasks, {concurrency} at a time; results in {output_path}")
+    failed = asyncio.run(run_batch(tasks, output_path, concurrency, limiter, verbose))
+    print(
+        f"Finished {len(tasks) - failed}/{len(tasks)} tasks in {time.perf_counter() - started:.1f}s"
+        f" ({failed} failed, {limiter.waited:.1f}s waiting on rate limits)"
+    )
+    return failed
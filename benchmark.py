@@ -0,0 +1,207 @@
+"""Benchmarks for the tools in functions/ and the agent loop over synthetic working directories.
+
+Usage:
+    python benchmark.py [--size small|medium|large] [--repeat N] [--tolerance 0.5] [--update-baseline] [--check]
+
+Each benchmark reports p50/p99 latency, throughput and the process peak RSS after it ran, and
+its p50 relative to benchmark_baseline.json. Absolute timings only compare on the machine the
+baseline was recorded on, so regressions beyond the tolerance fail the run (exit status 1)
+only with --check; record a baseline on the CI machine with --update-baseline before gating.
+Tools run without the tool result cache so repeated calls measure the work, not cache hits.
+"""
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+from google.genai import types
+
+from functions import file_index
+from functions.dispatch import run_ordered
+from functions.function_call import function_map
+from replay import ReplayClient
+
+SIZES = {
+    "small": {"files": 100, "log_mb": 1},
+    "medium": {"files": 1000, "log_mb": 50},
+    "large": {"files": 10000, "log_mb": 500},
+}
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+FILES_PER_DIRECTORY = 100
+NOISE_FLOOR_MS = 1.0
+
+
+def flag_value(name, default=None):
+    for index, arg in enumerate(sys.argv):
+        if arg.startswith(f"{name}="):
+            return arg.split("=", 1)[1]
+        if arg == name and index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return default
+
+
+def build_repo(root, files, log_mb):
+    """Create files Python modules spread over packages plus a log file of log_mb megabytes."""
+    for number in range(files):
+        package = os.path.join(root, "pkg", f"mod{number // FILES_PER_DIRECTORY}")
+        os.makedirs(package, exist_ok=True)
+        with open(os.path.join(package, f"file{number}.py"), "w", encoding="utf-8") as file:
+            file.write(
+                f'"""Synthetic module {number}."""\n\n\n'
+                f"def function_{number}(value):\n"
+                f"    return value * {number} + len('lorem ipsum dolor sit amet')\n"
+            )
+
+    line = b"2026-01-01T00:00:00 INFO worker processed request id=0123456789 status=200 duration_ms=12\n"
+    block = line * (1024 * 1024 // len(line))
+    with open(os.path.join(root, "app.log"), "wb") as file:
+        for _ in range(log_mb):
+            file.write(block)
+
+    with open(os.path.join(root, "script.py"), "w", encoding="utf-8") as file:
+        file.write("import sys\nprint('ok', sys.argv[1:])\n")
+
+
+def function_call_part(name, **args):
+    return types.Part.from_function_call(name=name, args=args)
+
+
+def candidate(parts):
+    return types.Candidate(content=types.Content(role="model", parts=parts))
+
+
+def session_turns(files):
+    """A scripted five-turn session: list, batch of reads, search, edit, final answer."""
+    reads = [function_call_part("get_file_content", file_path=f"pkg/mod0/file{number}.py") for number in range(min(files, 10))]
+    parts = [
+        [function_call_part("get_files_info", directory="pkg/mod0")],
+        reads,
+        [function_call_part("search_files", pattern="function_1(")],
+        [function_call_part("write_file", file_path="pkg/mod0/file0.py", mode="edit", edits=[
+            {"search": "value * 0 ", "replace": "value * 00 "},
+            {"search": "value * 00 ", "replace": "value * 0 "},
+        ])],
+        [types.Part(text="Done.")],
+    ]
+    return [[types.GenerateContentResponse(candidates=[candidate(turn)])] for turn in parts]
+
+
+def benchmarks(root, files, log_size):
+    import main
+
+    main.WORKING_DIRECTORY = root
+    main.user_prompt = "benchmark session"
+    # Without this every repeat after the first would be answered from the tool cache.
+    main.tool_map = dict(function_map)
+    main.tool_cache = None
+    reads = [function_call_part("get_file_content", file_path=f"pkg/mod0/file{number}.py") for number in range(min(files, 10))]
+
+    def run_session():
+        main.client = ReplayClient(session_turns(files))
+        main.main()
+
+    def dispatch_reads():
+        calls = [(part.function_call.name, dict(part.function_call.args)) for part in reads]
+        run_ordered(calls, lambda index: function_map[calls[index][0]](root, **calls[index][1]))
+
+    return {
+        "get_files_info_recursive": lambda: function_map["get_files_info"](root, recursive=True),
+        "get_file_content_head": lambda: function_map["get_file_content"](root, "app.log"),
+        "get_file_content_tail_bytes": lambda: function_map["get_file_content"](root, "app.log", offset=log_size - 4096, unit="bytes"),
+        "get_file_content_deep_lines": lambda: function_map["get_file_content"](root, "app.log", offset=10000, limit=50),
+        "search_files_literal": lambda: function_map["search_files"](root, "function_7("),
+        "search_files_regex": lambda: function_map["search_files"](root, r"function_\d+5\(", regex=True),
+        "write_file_edit": lambda: (
+            function_map["write_file"](root, "pkg/mod0/file1.py", mode="edit", edits=[{"search": "value * 1 ", "replace": "value * 2 "}]),
+            function_map["write_file"](root, "pkg/mod0/file1.py", mode="edit", edits=[{"search": "value * 2 ", "replace": "value * 1 "}]),
+        ),
+        "run_python_file": lambda: function_map["run_python_file"](root, "script.py", ["a"]),
+        "process_response_parts_serial": lambda: main.process_response_parts(candidate(reads), False, False),
+        "process_response_parts_parallel": lambda: main.process_response_parts(candidate(reads), False, True),
+        "dispatch_reads_parallel": dispatch_reads,
+        "main_replay_session": run_session,
+    }
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def measure(function, repeat):
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        function()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+        "ops_per_s": round(1000 / statistics.mean(samples), 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        limit = previous["p50_ms"] * (1 + tolerance)
+        if result["p50_ms"] > limit and result["p50_ms"] - previous["p50_ms"] > NOISE_FLOOR_MS:
+            regressions.append(f"{name}: p50 {result['p50_ms']} ms > baseline {previous['p50_ms']} ms (+{tolerance:.0%})")
+    return regressions
+
+
+def main():
+    size = flag_value("--size", "small")
+    repeat = int(flag_value("--repeat", 20))
+    tolerance = float(flag_value("--tolerance", 0.5))
+    settings = SIZES[size]
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = os.path.join(temp_dir, "repo")
+        file_index.CACHE_DIR = os.path.join(temp_dir, "cache")
+        print(f"Building {size} repository ({settings['files']} files, {settings['log_mb']} MB log)...")
+        build_repo(root, settings["files"], settings["log_mb"])
+        log_size = os.path.getsize(os.path.join(root, "app.log"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            cases = benchmarks(root, settings["files"], log_size)
+
+        results = {}
+        print(f"{'benchmark':<34} {'p50 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'peak RSS MB':>12} {'vs baseline':>12}")
+        for name, function in cases.items():
+            result = measure(function, repeat)
+            results[f"{size}/{name}"] = result
+            previous = baseline.get(f"{size}/{name}")
+            change = f"{result['p50_ms'] / previous['p50_ms'] - 1:+.0%}" if previous and previous["p50_ms"] else "n/a"
+            print(f"{name:<34} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['ops_per_s']:>9.1f} {result['peak_rss_mb']:>12.1f} {change:>12}")
+
+    if "--update-baseline" in sys.argv:
+        baseline.update(results)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print(f"Baseline updated: {BASELINE_PATH}")
+        return
+
+    regressions = compare(results, baseline, tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    if regressions and "--check" in sys.argv:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
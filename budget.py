@@ -0,0 +1,72 @@
+import time
+
+WIND_DOWN_PROMPT = (
+    "The session budget is used up ({reason}). Do not call any more functions. Reply with a "
+    "short summary of what you did, the current state, and what is left to do."
+)
+
+
+class SessionBudget:
+    """Per-session ceilings on wall-clock time, prompt and output tokens and tool time.
+
+    A limit of None means unlimited. Prompt tokens add up the prompt of every request, so
+    they measure what the session is billed rather than the size of the history. Tool time
+    is the time the loop spent waiting for tools to finish.
+    """
+
+    def __init__(self, max_seconds=None, max_prompt_tokens=None, max_output_tokens=None, max_tool_seconds=None):
+        self.max_seconds = max_seconds
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_output_tokens = max_output_tokens
+        self.max_tool_seconds = max_tool_seconds
+        self.started = time.monotonic()
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.tool_seconds = 0.0
+
+    def add_usage(self, usage):
+        if usage:
+            self.prompt_tokens += usage.prompt_token_count or 0
+            self.output_tokens += usage.candidates_token_count or 0
+
+    def add_tool_time(self, seconds):
+        self.tool_seconds += seconds
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def deadline(self):
+        """Return the monotonic time the wall-clock limit runs out, or None."""
+        if self.max_seconds is None:
+            return None
+        return self.started + self.max_seconds
+
+    def tool_deadline(self):
+        """Return the monotonic time the tools about to run must finish by, or None.
+
+        This is the earlier of the wall-clock deadline and the point where the tool time left
+        would be used up, so a long test run or script is stopped instead of overrunning.
+        """
+        deadlines = [self.deadline()]
+        if self.max_tool_seconds is not None:
+            deadlines.append(time.monotonic() + self.max_tool_seconds - self.tool_seconds)
+        return min((deadline for deadline in deadlines if deadline is not None), default=None)
+
+    def exceeded(self):
+        """Return a description of the first limit reached, or None."""
+        checks = [
+            (self.max_seconds, self.elapsed(), "{:.0f}s of {}s wall-clock time"),
+            (self.max_prompt_tokens, self.prompt_tokens, "{} of {} prompt tokens"),
+            (self.max_output_tokens, self.output_tokens, "{} of {} output tokens"),
+            (self.max_tool_seconds, self.tool_seconds, "{:.1f}s of {}s tool time"),
+        ]
+        for limit, used, message in checks:
+            if limit is not None and used >= limit:
+                return message.format(used, limit)
+        return None
+
+    def summary(self):
+        return (
+            f"Budget: {self.elapsed():.1f}s elapsed, {self.prompt_tokens} prompt and "
+            f"{self.output_tokens} output tokens, {self.tool_seconds:.1f}s in tools"
+        )
@@ -0,0 +1,68 @@
+"""Compares per-call evaluation with compiled and batch evaluation of one formula template,
+then times parsing of single expressions with 100k to 400k tokens to show it stays linear.
+
+Usage: python benchmark.py [rows]
+"""
+import random
+import sys
+import time
+
+from pkg import calculator as calculator_module
+from pkg.calculator import Calculator
+
+EXPRESSION = "a * b + c / 2 - a * 3"
+
+
+def timed(label, function, rows, baseline=None):
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    speedup = f"{baseline / elapsed:8.1f}x" if baseline else f"{'1.0x':>9}"
+    print(f"{label:<34} {elapsed * 1000:10.1f} ms {rows / elapsed:14,.0f} rows/s {speedup}")
+    return elapsed
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    columns = {name: [random.uniform(-100, 100) for _ in range(rows)] for name in "abc"}
+    calculator = Calculator()
+
+    def per_call():
+        # The pre-compile usage: substitute the values into the text and evaluate it.
+        for a, b, c in zip(columns["a"], columns["b"], columns["c"]):
+            calculator.evaluate(f"{a} * {b} + {c} / 2 - {a} * 3")
+
+    def compiled():
+        program = calculator.compile(EXPRESSION)
+        for a, b, c in zip(columns["a"], columns["b"], columns["c"]):
+            program.evaluate({"a": a, "b": b, "c": c})
+
+    def batch_lists():
+        saved, calculator_module.np = calculator_module.np, None
+        try:
+            calculator.evaluate_batch(EXPRESSION, columns)
+        finally:
+            calculator_module.np = saved
+
+    print(f"{rows:,} rows of {EXPRESSION!r}")
+    baseline = timed("evaluate (text per row)", per_call, rows)
+    timed("compile + Program.evaluate", compiled, rows, baseline)
+    timed("evaluate_batch (lists)", batch_lists, rows, baseline)
+    if calculator_module.np is not None:
+        arrays = {name: calculator_module.np.asarray(values) for name, values in columns.items()}
+        timed("evaluate_batch (NumPy)", lambda: calculator.evaluate_batch(EXPRESSION, arrays), rows, baseline)
+    else:
+        print("evaluate_batch (NumPy)             skipped: NumPy is not installed")
+
+    print()
+    for tokens in (100_000, 200_000, 400_000):
+        # Each "(1 - x) * 2 + " term is 8 tokens.
+        long_expression = " + ".join(["(1 - x) * 2"] * (tokens // 8))
+        start = time.perf_counter()
+        calculator.evaluate(long_expression, {"x": 0.5})
+        elapsed = time.perf_counter() - start
+        print(f"{'evaluate (' + format(tokens, ',') + ' tokens)':<34} {elapsed * 1000:10.1f} ms {tokens / elapsed:14,.0f} tokens/s")
+
+
+if __name__ == "__main__":
+    main()
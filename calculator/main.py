@@ -1,13 +1,50 @@
 import sys
 from pkg.calculator import Calculator
 from pkg.render import render
+from pkg.stream import FORMATS, run_stream
+
+# Text buffer for streamed output; results are written a chunk at a time.
+OUTPUT_BUFFER_BYTES = 1 << 20
+
+
+def flag_value(name, default=None):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return default
+
+
+def stream():
+    output_format = flag_value("--format", "plain")
+    if output_format not in FORMATS:
+        print(f"Error: --format must be one of {', '.join(FORMATS)}")
+        return 2
+    workers = int(flag_value("--workers", "1"))
+
+    output = open(sys.stdout.fileno(), "w", buffering=OUTPUT_BUFFER_BYTES, encoding="utf-8", closefd=False)
+    path = flag_value("--file")
+    try:
+        if path is not None:
+            with open(path, encoding="utf-8") as file:
+                total, errors = run_stream(file, output, output_format, workers)
+        else:
+            total, errors = run_stream(sys.stdin, output, output_format, workers)
+    finally:
+        output.flush()
+    print(f"Evaluated {total} lines, {errors} errors", file=sys.stderr)
+    return 1 if errors else 0
 
 
 def main():
+    if "--stdin" in sys.argv or "--file" in sys.argv:
+        sys.exit(stream())
+
     calculator = Calculator()
     if len(sys.argv) <= 1:
         print("Calculator App")
         print('Usage: python main.py "<expression>"')
+        print('       python main.py --stdin | --file <path> [--format plain|csv|jsonl] [--workers N]')
         print('Example: python main.py "3 + 5"')
         return
 
@@ -1,59 +1,345 @@
+import math
+import operator
+import re
+from functools import lru_cache
+from itertools import repeat
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+COMPILE_CACHE_SIZE = 1024
+# One token per match. Every quantifier is possessive and the alternatives start with disjoint
+# characters, so matching never backtracks and tokenizing is linear in the expression length.
+TOKEN = re.compile(r"""
+    \s*+
+    (?:
+        (?P<number>(?:[0-9]++(?:\.[0-9]*+)?+|\.[0-9]++)(?:[eE][+-]?+[0-9]++)?+)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*+)(?P<call>\s*+\()?+
+      | (?P<symbol>\*\*|[-+*/%^(),])
+      | (?P<invalid>\S)
+    )
+""", re.VERBOSE)
+# Functions whose NumPy ufunc of the same name behaves like the math version on arrays.
+NUMPY_UFUNCS = ("sqrt", "exp", "sin", "cos", "tan", "floor", "ceil", "abs")
+# Key of prefix minus in the precedence table.
+UNARY = "u-"
+
+
+class ExpressionError(ValueError):
+    """A syntax error in an expression; position is the 0-based offset where it was found."""
+
+    def __init__(self, message, position):
+        super().__init__(f"{message} at position {position}")
+        self.position = position
+
+
+def tokenize(expression):
+    """Yield (kind, text, position) for each token of the expression, left to right.
+
+    Kinds are "number", "name", "function" (a name followed by "(", which belongs to the
+    token), "symbol" and "invalid". The parser reads the same tokens through TOKEN.findall,
+    which is faster, and only calls this to locate a token when it reports an error.
+    """
+    for match in TOKEN.finditer(expression.rstrip()):
+        kind = match.lastgroup
+        if kind == "call":
+            yield "function", match.group("name"), match.start("name")
+        else:
+            yield kind, match.group(kind), match.start(kind)
+
+
+class Program:
+    """A compiled expression: postfix instructions with operators already resolved.
+
+    Instructions are (kind, value) pairs: ("number", float), ("variable", name),
+    ("binary", function), ("unary", function) or ("function", (function, argument count, name));
+    constant arithmetic is folded into numbers. Evaluating it never re-tokenizes or re-parses
+    the expression.
+    """
+
+    def __init__(self, expression, instructions, variables):
+        self.expression = expression
+        self.instructions = instructions
+        self.variables = variables
+
+    def evaluate(self, variables=None):
+        values = []
+        for kind, value in self.instructions:
+            if kind == "number":
+                values.append(value)
+            elif kind == "variable":
+                try:
+                    values.append(variables[value])
+                except (KeyError, TypeError):
+                    raise ValueError(f"unbound variable: {value}")
+            elif kind == "binary":
+                b = values.pop()
+                values[-1] = value(values[-1], b)
+            elif kind == "unary":
+                values[-1] = value(values[-1])
+            else:
+                function, count, _ = value
+                arguments = values[len(values) - count:]
+                del values[len(values) - count:]
+                values.append(function(*arguments))
+        return values[0]
+
+    def evaluate_batch(self, variables):
+        """Evaluate over equal-length columns of variable values in one vectorized pass.
+
+        With NumPy installed the columns become float arrays and the result is an array
+        (division by zero gives inf or nan, as in NumPy). Without it the result is a list.
+        """
+        length = None
+        for name in self.variables:
+            if name not in variables:
+                raise ValueError(f"unbound variable: {name}")
+            if length is None:
+                length = len(variables[name])
+            elif len(variables[name]) != length:
+                raise ValueError("variable columns must all have the same length")
+
+        if np is not None:
+            columns = {name: np.asarray(variables[name], dtype=float) for name in self.variables}
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result = self._run_columns(columns, _apply_arrays)
+            if length is not None and np.ndim(result) == 0:
+                result = np.full(length, result)
+            return result
+
+        columns = {name: [float(item) for item in variables[name]] for name in self.variables}
+        result = self._run_columns(columns, _apply_lists)
+        if length is not None and not isinstance(result, list):
+            result = [result] * length
+        return result
+
+    def _run_columns(self, columns, apply):
+        values = []
+        for kind, value in self.instructions:
+            if kind == "number":
+                values.append(value)
+            elif kind == "variable":
+                values.append(columns[value])
+            elif kind == "binary":
+                b = values.pop()
+                values[-1] = apply(value, (values[-1], b))
+            elif kind == "unary":
+                values[-1] = apply(value, (values[-1],))
+            else:
+                function, count, name = value
+                arguments = tuple(values[len(values) - count:])
+                del values[len(values) - count:]
+                values.append(apply(function, arguments, name))
+        return values[0]
+
+
+def _apply_lists(function, arguments, name=None):
+    if not any(isinstance(argument, list) for argument in arguments):
+        return function(*arguments)
+    return list(map(function, *(argument if isinstance(argument, list) else repeat(argument) for argument in arguments)))
+
+
+def _apply_arrays(function, arguments, name=None):
+    if name is None:
+        return function(*arguments)
+    if name in NUMPY_UFUNCS:
+        return getattr(np, name)(*arguments)
+    if all(np.ndim(argument) == 0 for argument in arguments):
+        return function(*arguments)
+    return np.frompyfunc(function, len(arguments), 1)(*arguments).astype(float)
+
+
 class Calculator:
     def __init__(self):
         self.operators = {
-            "+" : lambda a, b: a + b,
-            "-" : lambda a, b: a - b,
-            "*" : lambda a, b: a * b,
-            "/" : lambda a, b: a / b,
+            "+" : operator.add,
+            "-" : operator.sub,
+            "*" : operator.mul,
+            "/" : operator.truediv,
+            "%" : operator.mod,
+            "**" : operator.pow,
+            "^" : operator.pow,
+        }
+        self.unary_operators = {
+            "-" : operator.neg,
         }
+        # Prefix minus binds tighter than * but looser than exponentiation: -2 ** 2 is -4.
         self.precedence = {
             "+" : 1,
             "-" : 1,
             "*" : 2,
             "/" : 2,
+            "%" : 2,
+            UNARY : 3,
+            "**" : 4,
+            "^" : 4,
         }
+        self.right_associative = {"**", "^"}
+        self.constants = {
+            "pi" : math.pi,
+            "e" : math.e,
+            "tau" : math.tau,
+            "inf" : math.inf,
+        }
+        self.compile = lru_cache(maxsize=COMPILE_CACHE_SIZE)(self._compile)
+        self.functions = {}
+        for name in ("sqrt", "exp", "sin", "cos", "tan", "asin", "acos", "atan", "sinh", "cosh", "tanh", "floor", "ceil", "log10"):
+            self.register_function(name, getattr(math, name))
+        self.register_function("abs", abs)
+        self.register_function("ln", math.log)
+        self.register_function("log", math.log, 1, 2)
+        self.register_function("round", round, 1, 2)
+        self.register_function("atan2", math.atan2, 2)
+        self.register_function("hypot", math.hypot, 1, None)
+        self.register_function("min", min, 1, None)
+        self.register_function("max", max, 1, None)
+
+    def register_function(self, name, function, min_args=1, max_args=...):
+        """Make function callable from expressions; max_args defaults to min_args, None means any."""
+        self.functions[name] = (function, min_args, min_args if max_args is ... else max_args)
+        self.compile.cache_clear()
 
-    def evaluate(self, expression):
+    def evaluate(self, expression, variables=None):
         if not expression or expression.isspace():
             return None
-        tokens = expression.strip().split()
-        return self._evaluate_infix(tokens)
+        return self._compile(expression).evaluate(variables)
 
-    def _evaluate_infix(self, tokens):
-        values = []
-        operators = []
-
-        for token in tokens:
-            if token in self.operators:
-                while (
-                    operators
-                    and operators[-1] in self.operators
-                    and self.precedence[operators[-1]] >= self.precedence[token]
-                ):
-                    self._apply_operator(operators, values)
-                operators.append(token)
+    def evaluate_batch(self, expression, variables):
+        """Evaluate expression once per row of the variable columns; see Program.evaluate_batch.
+
+        Use compile() and Program.evaluate to evaluate one expression for many single bindings;
+        evaluate() parses the text on every call.
+        """
+        return self.compile(expression).evaluate_batch(variables)
+
+    def _compile(self, expression):
+        """Parse expression into a Program with the shunting-yard algorithm, in one pass.
+
+        The parser alternates between expecting an operand (a number, name, function call, "("
+        or prefix minus) and expecting an operator, ")" or ","; anything else is reported with
+        its position. Operators wait on a stack until one of lower precedence arrives.
+        """
+        if not expression or expression.isspace():
+            raise ValueError("empty expression")
+
+        instructions = []
+        variables = []
+        # Entries are [kind, symbol, token index, arguments]: kind is "binary", "unary", "(" or
+        # "function", and arguments counts the completed arguments of a function call.
+        stack = []
+        expect_operand = True
+
+        for index, (number, name, call, symbol, invalid) in enumerate(TOKEN.findall(expression.rstrip())):
+            if expect_operand:
+                if number:
+                    instructions.append(("number", float(number)))
+                    expect_operand = False
+                elif call:
+                    if name not in self.functions:
+                        raise ExpressionError(f"unknown function {name!r}", _token_position(expression, index))
+                    stack.append(["function", name, index, 0])
+                elif name:
+                    if name in self.constants:
+                        instructions.append(("number", self.constants[name]))
+                    else:
+                        instructions.append(("variable", name))
+                        if name not in variables:
+                            variables.append(name)
+                    expect_operand = False
+                elif symbol == "(":
+                    stack.append(["(", symbol, index, 0])
+                elif symbol in self.unary_operators:
+                    stack.append(["unary", symbol, index, 0])
+                elif symbol == ")" and stack and stack[-1][0] == "function" and stack[-1][3] == 0:
+                    self._emit_call(stack.pop(), instructions, expression)
+                    expect_operand = False
+                else:
+                    found = symbol or invalid
+                    message = "invalid character" if invalid else "expected a number, name or '(' but found"
+                    raise ExpressionError(f"{message} {found!r}", _token_position(expression, index))
+            elif symbol in self.operators:
+                precedence = self.precedence[symbol]
+                while stack and stack[-1][0] in ("binary", "unary"):
+                    top = stack[-1]
+                    top_precedence = self.precedence[UNARY if top[0] == "unary" else top[1]]
+                    if top_precedence < precedence or (top_precedence == precedence and symbol in self.right_associative):
+                        break
+                    self._emit(stack.pop(), instructions, expression)
+                stack.append(["binary", symbol, index, 0])
+                expect_operand = True
+            elif symbol == ")" or symbol == ",":
+                while stack and stack[-1][0] in ("binary", "unary"):
+                    self._emit(stack.pop(), instructions, expression)
+                if symbol == ",":
+                    if not stack or stack[-1][0] != "function":
+                        raise ExpressionError("',' outside a function call", _token_position(expression, index))
+                    stack[-1][3] += 1
+                    expect_operand = True
+                elif not stack:
+                    raise ExpressionError("unmatched ')'", _token_position(expression, index))
+                elif stack[-1][0] == "function":
+                    stack[-1][3] += 1
+                    self._emit_call(stack.pop(), instructions, expression)
+                else:
+                    stack.pop()
             else:
-                try:
-                    values.append(float(token))
-                except ValueError:
-                    raise ValueError(f"invalid token: {token}")
+                if invalid:
+                    found = f"invalid character {invalid!r}"
+                else:
+                    found = f"expected an operator but found {number and f'{float(number):g}' or name or symbol!r}"
+                raise ExpressionError(found, _token_position(expression, index))
 
-        while operators:
-            self._apply_operator(operators, values)
+        if expect_operand:
+            raise ExpressionError("expected a number, name or '(' but reached the end", len(expression))
+        while stack:
+            entry = stack.pop()
+            if entry[0] in ("(", "function"):
+                raise ExpressionError("missing ')' for the '(' opened", _token_position(expression, entry[2]))
+            self._emit(entry, instructions, expression)
 
-        if len(values) != 1:
-            raise ValueError("invalid expression")
+        return Program(expression, instructions, tuple(variables))
 
-        return values[0]
+    def _emit_call(self, entry, instructions, expression):
+        _, name, index, count = entry
+        function, min_args, max_args = self.functions[name]
+        if count < min_args or (max_args is not None and count > max_args):
+            if min_args == max_args:
+                expected = str(min_args)
+            elif max_args is None:
+                expected = f"at least {min_args}"
+            else:
+                expected = f"{min_args} to {max_args}"
+            plural = "" if expected in ("1", "at least 1") else "s"
+            raise ExpressionError(f"{name}() takes {expected} argument{plural}, got {count}", _token_position(expression, index))
+        instructions.append(("function", (function, count, name)))
 
-    def _apply_operator(self, operators, values):
-        if not operators:
+    def _emit(self, entry, instructions, expression):
+        kind, symbol, index, _ = entry
+        # Fold constant operands now so compiled programs only do work that depends on variables.
+        if kind == "unary":
+            function = self.unary_operators[symbol]
+            if instructions[-1][0] == "number":
+                instructions[-1] = ("number", function(instructions[-1][1]))
+            else:
+                instructions.append(("unary", function))
             return
 
-        operator = operators.pop()
-        if len(values) < 2:
-            raise ValueError(f"not enough operands for operator {operator}")
+        function = self.operators[symbol]
+        if instructions[-1][0] == "number" and instructions[-2][0] == "number":
+            b = instructions.pop()[1]
+            try:
+                instructions[-1] = ("number", function(instructions[-1][1], b))
+            except ArithmeticError as e:
+                raise type(e)(f"{e} at position {_token_position(expression, index)}") from None
+        else:
+            instructions.append(("binary", function))
+
 
-        b = values.pop()
-        a = values.pop()
-        values.append(self.operators[operator](a, b))
+def _token_position(expression, index):
+    """Return the offset of the index-th token; only needed when reporting an error."""
+    for position, (_, _, offset) in enumerate(tokenize(expression)):
+        if position == index:
+            return offset
+    return len(expression)
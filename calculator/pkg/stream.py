@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+import multiprocessing
+from itertools import islice
+
+from pkg.calculator import Calculator
+from pkg.render import format_result
+
+FORMATS = ("plain", "csv", "jsonl")
+CSV_HEADER = ("line", "expression", "result", "error")
+# Lines evaluated and formatted together before one write to the output.
+CHUNK_LINES = 4096
+# Chunks handed to the pool at a time, per worker, so large inputs are never read into memory whole.
+CHUNKS_PER_WORKER = 4
+
+_calculator = None
+
+
+def evaluate_chunk(calculator, chunk, output_format):
+    """Evaluate (line number, text) pairs; return the formatted output and the error count.
+
+    Blank lines produce no output, except an empty line in plain format so its output lines
+    stay aligned with the input.
+    """
+    rows = []
+    errors = 0
+    for line_number, text in chunk:
+        expression = text.strip()
+        if not expression:
+            if output_format == "plain":
+                rows.append((line_number, "", None, None))
+            continue
+        try:
+            rows.append((line_number, expression, calculator.evaluate(expression), None))
+        except Exception as e:
+            errors += 1
+            rows.append((line_number, expression, None, str(e)))
+
+    if output_format == "plain":
+        output = "".join(
+            f"Error: {error}\n" if error else f"{'' if result is None else format_result(result)}\n"
+            for _, _, result, error in rows
+        )
+    elif output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        for number, expression, result, error in rows:
+            writer.writerow((number, expression, "" if error else format_result(result), error or ""))
+        output = buffer.getvalue()
+    else:
+        lines = []
+        for number, expression, result, error in rows:
+            if not error:
+                try:
+                    # JSON has no inf or nan; writing them would make the line unparseable.
+                    lines.append(json.dumps({"line": number, "expression": expression, "result": result}, allow_nan=False) + "\n")
+                    continue
+                except ValueError:
+                    errors += 1
+                    error = f"result is not a finite number: {result}"
+            lines.append(json.dumps({"line": number, "expression": expression, "error": error}) + "\n")
+        output = "".join(lines)
+    return output, errors
+
+
+def _start_worker():
+    global _calculator
+    _calculator = Calculator()
+
+
+def _evaluate_in_worker(job):
+    chunk, output_format = job
+    return evaluate_chunk(_calculator, chunk, output_format)
+
+
+def _chunks(lines, size):
+    numbered = enumerate(lines, start=1)
+    while chunk := list(islice(numbered, size)):
+        yield chunk
+
+
+def run_stream(lines, output, output_format="plain", workers=1, chunk_lines=CHUNK_LINES):
+    """Evaluate every line of lines and write the results to output; return (lines, errors).
+
+    A failing line is reported in its output row and the run continues. With workers > 1 the
+    chunks are evaluated in a process pool and written back in input order.
+    """
+    if output_format not in FORMATS:
+        raise ValueError(f"unknown output format: {output_format}")
+    if output_format == "csv":
+        output.write(",".join(CSV_HEADER) + "\n")
+
+    total = 0
+    errors = 0
+    chunks = _chunks(lines, chunk_lines)
+    if workers <= 1:
+        calculator = Calculator()
+        results = (evaluate_chunk(calculator, chunk, output_format) + (len(chunk),) for chunk in chunks)
+        for text, chunk_errors, count in results:
+            output.write(text)
+            total += count
+            errors += chunk_errors
+        return total, errors
+
+    with multiprocessing.Pool(workers, initializer=_start_worker) as pool:
+        while window := list(islice(chunks, workers * CHUNKS_PER_WORKER)):
+            jobs = [(chunk, output_format) for chunk in window]
+            for chunk, (text, chunk_errors) in zip(window, pool.imap(_evaluate_in_worker, jobs)):
+                output.write(text)
+                total += len(chunk)
+                errors += chunk_errors
+    return total, errors
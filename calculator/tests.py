@@ -1,5 +1,10 @@
+import io
+import json
 import unittest
-from pkg.calculator import Calculator
+from unittest import mock
+from pkg import calculator as calculator_module
+from pkg.calculator import Calculator, ExpressionError
+from pkg.stream import run_stream
 
 
 class TestCalculator(unittest.TestCase):
@@ -42,6 +47,114 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.calculator.evaluate("+ 3")
 
+    def test_variables(self):
+        result = self.calculator.evaluate("x * 2 + y", {"x": 3, "y": 4})
+        self.assertEqual(result, 10)
+
+    def test_unbound_variable(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("x + 1")
+
+    def test_compile_is_cached(self):
+        program = self.calculator.compile("a + b * 2")
+        self.assertIs(self.calculator.compile("a + b * 2"), program)
+        self.assertEqual(program.variables, ("a", "b"))
+        self.assertEqual(program.evaluate({"a": 1, "b": 3}), 7)
+
+    def test_evaluate_batch_lists(self):
+        with mock.patch.object(calculator_module, "np", None):
+            result = self.calculator.evaluate_batch("a * b - 1", {"a": [1, 2, 3], "b": [4, 5, 6]})
+            constant = self.calculator.evaluate_batch("2 + 3", {})
+        self.assertEqual(list(result), [3, 9, 17])
+        self.assertEqual(constant, 5)
+
+    def test_evaluate_batch_matches_evaluate(self):
+        expression = "x / 4 + y * x - 3"
+        xs = [1.5, -2, 8, 0.25]
+        ys = [3, 0, -1, 10]
+        result = self.calculator.evaluate_batch(expression, {"x": xs, "y": ys})
+        expected = [self.calculator.evaluate(expression, {"x": x, "y": y}) for x, y in zip(xs, ys)]
+        self.assertEqual([float(value) for value in result], expected)
+
+    def test_evaluate_batch_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_batch("x + y", {"x": [1, 2], "y": [1]})
+
+    def test_parentheses(self):
+        result = self.calculator.evaluate("(3 + 5) * (2 - (4 - 1))")
+        self.assertEqual(result, -8)
+
+    def test_unary_minus(self):
+        self.assertEqual(self.calculator.evaluate("-3 + -(2 * 4)"), -11)
+        self.assertEqual(self.calculator.evaluate("-2 ** 2"), -4)
+
+    def test_power_is_right_associative(self):
+        self.assertEqual(self.calculator.evaluate("2 ** 3 ** 2"), 512)
+        self.assertEqual(self.calculator.evaluate("2 ^ 3 ^ 2"), 512)
+
+    def test_modulo_and_decimals(self):
+        self.assertEqual(self.calculator.evaluate("17 % 5 * 2"), 4)
+        self.assertEqual(self.calculator.evaluate("1.5e2 + .5"), 150.5)
+
+    def test_constants_and_functions(self):
+        self.assertAlmostEqual(self.calculator.evaluate("sin(pi / 2) + sqrt(16)"), 5)
+        self.assertEqual(self.calculator.evaluate("log(8, 2) + max(1, x, 3)", {"x": 7}), 10)
+
+    def test_function_arity(self):
+        with self.assertRaises(ExpressionError):
+            self.calculator.evaluate("sqrt(1, 2)")
+
+    def test_error_positions(self):
+        cases = {"3 + $": 4, "(1 + 2": 0, "1 + 2)": 5, "3 5": 2, "2 *": 3, "rand(1)": 0}
+        for expression, position in cases.items():
+            with self.subTest(expression=expression):
+                with self.assertRaises(ExpressionError) as raised:
+                    self.calculator.evaluate(expression)
+                self.assertEqual(raised.exception.position, position)
+
+    def test_long_expression(self):
+        expression = " + ".join(["(1 - x) * 2"] * 20000)
+        self.assertEqual(self.calculator.evaluate(expression, {"x": 0.5}), 20000)
+
+
+class TestStream(unittest.TestCase):
+    lines = ["3 + 5\n", "\n", "2 *\n", "10 / 4\n"]
+
+    def run_stream(self, output_format, workers=1):
+        output = io.StringIO()
+        counts = run_stream(self.lines, output, output_format, workers, chunk_lines=2)
+        return output.getvalue(), counts
+
+    def test_plain_keeps_lines_aligned(self):
+        output, counts = self.run_stream("plain")
+        self.assertEqual(output.splitlines(), ["8", "", "Error: expected a number, name or '(' but reached the end at position 3", "2.5"])
+        self.assertEqual(counts, (4, 1))
+
+    def test_csv(self):
+        output, _ = self.run_stream("csv")
+        rows = output.splitlines()
+        self.assertEqual(rows[0], "line,expression,result,error")
+        self.assertEqual(rows[1], "1,3 + 5,8,")
+        self.assertEqual(rows[3], "4,10 / 4,2.5,")
+
+    def test_jsonl_reports_errors_per_line(self):
+        output, _ = self.run_stream("jsonl")
+        records = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual([record["line"] for record in records], [1, 3, 4])
+        self.assertIn("error", records[1])
+        self.assertEqual(records[2]["result"], 2.5)
+
+    def test_jsonl_reports_non_finite_results_as_errors(self):
+        output = io.StringIO()
+        counts = run_stream(["1e308 * 10\n", "1 + 1\n"], output, "jsonl")
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(records[0], {"line": 1, "expression": "1e308 * 10", "error": "result is not a finite number: inf"})
+        self.assertEqual(records[1]["result"], 2)
+        self.assertEqual(counts, (2, 1))
+
+    def test_workers_preserve_order(self):
+        self.assertEqual(self.run_stream("jsonl", workers=2), self.run_stream("jsonl"))
+
 
 if __name__ == "__main__":
     unittest.main()
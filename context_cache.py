@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import time
+
+from functions.config import CACHE_DIR
+
+DEFAULT_TTL_SECONDS = 3600
+# Extend a handle's TTL once less than this fraction of it is left, so long-lived daemons and
+# batch runs never reference a handle that expires mid-session.
+REFRESH_FRACTION = 0.5
+REGISTRY_PATH = os.path.join(CACHE_DIR, "context_caches.json")
+
+
+def load_registry(path=REGISTRY_PATH):
+    """Return the live cache handles recorded in path, dropping those that have expired."""
+    try:
+        with open(path, encoding="utf-8") as file:
+            entries = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    now = time.time()
+    return {key: entry for key, entry in entries.items() if entry["expires"] > now}
+
+
+def save_registry(entries, path=REGISTRY_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(entries, file, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def read_pinned_files(working_directory, pinned_files):
+    """Read the pinned files as (path, text) pairs, refusing paths outside the working directory."""
+    root = os.path.abspath(working_directory)
+    files = []
+    for file_path in pinned_files:
+        full_path = os.path.normpath(os.path.join(root, file_path))
+        if not full_path.startswith(root + os.sep):
+            raise ValueError(f'Cannot pin "{file_path}" as it is outside the permitted working directory')
+        with open(full_path, encoding="utf-8", errors="replace") as file:
+            files.append((file_path, file.read()))
+    return files
+
+
+class ContextCache:
+    """A provider-side cached prefix holding the system instruction, the tools and pinned files.
+
+    Handles are shared between runs through a local registry keyed by a hash of everything in
+    the prefix, so identical sessions reuse one handle until it expires and any change to the
+    prompt, the tools or a pinned file creates a new one. A handle is created for one model and
+    can only be used in requests to that model.
+    """
+
+    def __init__(self, client, model, system_instruction, tools, pinned_files=(), ttl=DEFAULT_TTL_SECONDS, registry_path=REGISTRY_PATH):
+        self.client = client
+        self.model = model
+        self.system_instruction = system_instruction
+        self.tools = tools
+        self.pinned_files = list(pinned_files)
+        self.ttl = ttl
+        self.registry_path = registry_path
+        self.key = self.prefix_key()
+        self.entry = None
+        self.created = False
+
+    def prefix_key(self):
+        digest = hashlib.sha256()
+        digest.update(self.model.encode())
+        digest.update(self.system_instruction.encode())
+        for tool in self.tools:
+            digest.update(json.dumps(tool.model_dump(mode="json", exclude_none=True), sort_keys=True).encode())
+        for file_path, text in self.pinned_files:
+            digest.update(file_path.encode())
+            digest.update(text.encode())
+        return digest.hexdigest()
+
+    def contents(self):
+        from google.genai import types
+
+        if not self.pinned_files:
+            return None
+        return [
+            types.Content(role="user", parts=[types.Part(text=f"Contents of {file_path}:\n{text}")])
+            for file_path, text in self.pinned_files
+        ]
+
+    def name(self):
+        """Return the handle's resource name, creating or extending it as needed."""
+        now = time.time()
+        if self.entry is None:
+            self.entry = load_registry(self.registry_path).get(self.key)
+        if self.entry is None:
+            self.create()
+        elif self.entry["expires"] - now < self.ttl * REFRESH_FRACTION:
+            self.refresh()
+        return self.entry["name"]
+
+    def create(self):
+        from google.genai import types
+
+        cached = self.client.caches.create(
+            model=self.model,
+            config=types.CreateCachedContentConfig(
+                display_name=f"geminiagent-{self.key[:12]}",
+                system_instruction=self.system_instruction,
+                tools=self.tools,
+                contents=self.contents(),
+                ttl=f"{self.ttl}s",
+            ),
+        )
+        tokens = cached.usage_metadata.total_token_count if cached.usage_metadata else None
+        self.entry = {"name": cached.name, "model": self.model, "expires": time.time() + self.ttl, "tokens": tokens}
+        self.created = True
+        self.save()
+
+    def refresh(self):
+        from google.genai import types
+
+        try:
+            self.client.caches.update(name=self.entry["name"], config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s"))
+        except Exception as e:
+            # Deleted or expired on the provider side earlier than the registry thought.
+            if getattr(e, "code", None) not in (403, 404):
+                raise
+            self.create()
+            return
+        self.entry["expires"] = time.time() + self.ttl
+        self.save()
+
+    def delete(self):
+        """Delete the handle from the provider and the registry once its prefix is stale."""
+        if self.entry is None:
+            return
+        try:
+            self.client.caches.delete(name=self.entry["name"])
+        except Exception as e:
+            if getattr(e, "code", None) not in (403, 404):
+                print(f"Warning: could not delete {self.entry['name']}: {e}")
+        entries = load_registry(self.registry_path)
+        if entries.get(self.key, {}).get("name") == self.entry["name"]:
+            del entries[self.key]
+            save_registry(entries, self.registry_path)
+        self.entry = None
+
+    def save(self):
+        entries = load_registry(self.registry_path)
+        entries[self.key] = self.entry
+        save_registry(entries, self.registry_path)
+
+    def summary(self):
+        if self.entry is None:
+            return "Context cache: not used"
+        state = "created" if self.created else "reused"
+        remaining = max(self.entry["expires"] - time.time(), 0) / 60
+        return f"Context cache: {state} {self.entry['name']} ({self.entry.get('tokens') or '?'} tokens, expires in {remaining:.0f} min)"
+
+
+def clear_registry(client, path=REGISTRY_PATH):
+    """Delete every live handle in the registry from the provider and empty the registry."""
+    entries = load_registry(path)
+    for entry in entries.values():
+        try:
+            client.caches.delete(name=entry["name"])
+        except Exception as e:
+            print(f"Warning: could not delete {entry['name']}: {e}")
+    save_registry({}, path)
+    return len(entries)
@@ -0,0 +1,183 @@
+"""Long-lived agent process that serves prompts over a Unix socket, and the thin client for it.
+
+Start the daemon once with the usual flags, then send prompts from scripts:
+
+    uv run main.py --serve [--socket PATH] [--warm-python] [--persist-tool-cache]
+    python daemon.py "<prompt>" [--verbose] [--socket PATH]
+
+The daemon keeps the model client (and its HTTP connection pool), the tool caches and the
+Python worker pool warm between prompts. The client only imports the standard library, so
+each invocation starts in a few milliseconds. Output is streamed back as the session runs.
+"""
+import json
+import os
+import socket
+import sys
+
+from functions.config import CACHE_DIR
+
+DEFAULT_SOCKET = os.path.join(CACHE_DIR, "agent.sock")
+
+
+def flag_value(name, default=None):
+    for index, arg in enumerate(sys.argv):
+        if arg.startswith(f"{name}="):
+            return arg.split("=", 1)[1]
+        if arg == name and index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return default
+
+
+class SessionStdout:
+    """Sends what each session prints to its own connection and everything else to stdout.
+
+    The destination is looked up in a context variable, which asyncio tasks and the threads
+    started with asyncio.to_thread inherit, so output from tools lands in the right session.
+    """
+
+    def __init__(self, stdout, output):
+        self.stdout = stdout
+        self.output = output
+
+    def write(self, text):
+        send = self.output.get()
+        if send is None:
+            return self.stdout.write(text)
+        send(text)
+        return len(text)
+
+    def flush(self):
+        self.stdout.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stdout, name)
+
+
+def serve_forever(socket_path=DEFAULT_SOCKET):
+    """Accept prompts on socket_path until interrupted; sessions run concurrently on one loop."""
+    import asyncio
+    import contextvars
+    import threading
+
+    import main
+
+    output = contextvars.ContextVar("session_output", default=None)
+
+    async def handle(reader, writer):
+        loop = asyncio.get_running_loop()
+        loop_thread = threading.get_ident()
+        # Output goes through a queue so a slow client is drained and tools never block on it.
+        queue = asyncio.Queue()
+
+        async def pump():
+            connected = True
+            while (data := await queue.get()) is not None:
+                if not connected:
+                    continue
+                try:
+                    writer.write(data)
+                    await writer.drain()
+                except ConnectionError:
+                    connected = False
+
+        def send(text):
+            data = (json.dumps({"output": text}) + "\n").encode()
+            if threading.get_ident() == loop_thread:
+                queue.put_nowait(data)
+            else:
+                loop.call_soon_threadsafe(queue.put_nowait, data)
+
+        pumping = asyncio.create_task(pump())
+        status = 0
+        response = None
+        token = output.set(send)
+        try:
+            request = json.loads(await reader.readline())
+            response = await main.run_session_async(main.get_client(), request["prompt"], request.get("verbose", False))
+        except Exception as e:
+            print(f"Error: {e}")
+            status = 1
+        finally:
+            output.reset(token)
+            queue.put_nowait(None)
+            await pumping
+
+        try:
+            writer.write((json.dumps({"done": True, "status": status, "response": response}) + "\n").encode())
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def run():
+        os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+        # Prompts can run code in the working directory, so only the owner may connect. The
+        # umask makes the socket private from the moment it is bound.
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(handle, path=socket_path)
+        finally:
+            os.umask(umask)
+        print(f"Agent daemon listening on {socket_path}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    if os.path.exists(socket_path):
+        if daemon_running(socket_path):
+            print(f"Error: an agent daemon is already listening on {socket_path}")
+            return 1
+        os.unlink(socket_path)
+
+    main.get_client()
+    main.get_tool_map()
+    sys.stdout = SessionStdout(sys.stdout, output)
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stdout = sys.stdout.stdout
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        main.finish_trace()
+    return 0
+
+
+def daemon_running(socket_path):
+    """Return whether something accepts connections on socket_path, as opposed to a stale file."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def send_prompt(prompt, verbose=False, socket_path=DEFAULT_SOCKET):
+    """Run prompt on the daemon at socket_path, printing its output; returns the exit status."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall((json.dumps({"prompt": prompt, "verbose": verbose}) + "\n").encode())
+        for line in connection.makefile(encoding="utf-8"):
+            message = json.loads(line)
+            if "output" in message:
+                sys.stdout.write(message["output"])
+                sys.stdout.flush()
+            elif message.get("done"):
+                return message["status"]
+    print("Error: the agent daemon closed the connection before the session finished")
+    return 1
+
+
+if __name__ == "__main__":
+    prompt = sys.argv[1] if len(sys.argv) > 1 else ""
+    if not prompt:
+        print("Prompt content cannot be empty. Please provide a valid prompt.")
+        sys.exit(1)
+    path = flag_value("--socket", DEFAULT_SOCKET)
+    try:
+        sys.exit(send_prompt(prompt, "--verbose" in sys.argv, path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"Error: no agent daemon is listening on {path}. Start one with: uv run main.py --serve")
+        sys.exit(1)
@@ -0,0 +1,317 @@
+import contextvars
+import ctypes
+import ctypes.util
+import difflib
+import hashlib
+import os
+import struct
+import sys
+import threading
+
+from functions.get_files_info import _gitignore_rules, _is_ignored
+
+# Files larger than this are compared by mtime and size only.
+MAX_HASH_BYTES = 4 * 1024 * 1024
+# Text of files up to this size is kept so modifications can be shown as diffs.
+MAX_DIFF_SOURCE_BYTES = 64 * 1024
+MAX_DIFF_CHARS = 4000
+MAX_LISTED_CHANGES = 20
+# Refreshes kept in the change log; a cursor further behind compares every file instead.
+MAX_LOG_ENTRIES = 1000
+# Never reported: interpreter and tool caches that change as a side effect of running code.
+IGNORED_NAMES = {".git", "__pycache__", ".pytest_cache", ".agent_cache"}
+
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT = struct.Struct("iIII")
+
+_journals = {}
+_journals_lock = threading.Lock()
+# The calling session's cursor; tool calls run in copies of the session's context.
+session_cursor = contextvars.ContextVar("session_cursor", default=None)
+
+
+class _Watcher:
+    """inotify watches on every directory of a tree, read without blocking after each tool call."""
+
+    def __init__(self, root, libc):
+        self.root = root
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}
+
+    @classmethod
+    def create(cls, root):
+        """Return a watcher for root, or None where inotify is unavailable."""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            return cls(root, libc)
+        except (OSError, AttributeError):
+            return None
+
+    def watch(self, relative_dir):
+        """Watch a directory; returns False if the kernel refuses, e.g. over max_user_watches."""
+        path = os.path.join(self.root, relative_dir) if relative_dir else self.root
+        descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if descriptor < 0:
+            return False
+        self.directories[descriptor] = relative_dir
+        return True
+
+    def read(self):
+        """Return (relative paths with events, whether events were lost) since the last read."""
+        paths = set()
+        overflow = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return paths, overflow
+            offset = 0
+            while offset < len(data):
+                descriptor, mask, _, length = EVENT.unpack_from(data, offset)
+                name = data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b"\0")
+                offset += EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif descriptor in self.directories and name:
+                    directory = self.directories[descriptor]
+                    name = os.fsdecode(name)
+                    paths.add(f"{directory}/{name}" if directory else name)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ChangeJournal:
+    """Tracks the files of a working directory and reports what changed between tool calls.
+
+    The journal keeps mtime, size and a content hash per file. On Linux an inotify watcher
+    says which paths had events, so only those are re-checked; elsewhere, or if the watcher
+    loses events, the whole tree is re-scanned with scandir. A file whose mtime changed but
+    whose content did not is not reported.
+
+    One journal serves every session in a working directory. Each refresh appends the paths
+    whose entry changed to a log, and each session reads it through its own JournalCursor, so
+    a session is told about every change since its own previous tool call.
+    """
+
+    def __init__(self, working_directory, diffs=False):
+        self.root = os.path.abspath(working_directory)
+        self.diffs = diffs
+        self.lock = threading.Lock()
+        self.rules = _gitignore_rules(self.root, self.root)
+        self.watcher = _Watcher.create(self.root)
+        self.files = {path: self._entry(path, stat) for path, stat in self._scan("")}
+        self.log = []
+        self.log_start = 0
+        self.default_cursor = JournalCursor(self, dict(self.files), 0)
+
+    def _ignored(self, relative_path, is_dir):
+        if any(part in IGNORED_NAMES for part in relative_path.split("/")):
+            return True
+        return _is_ignored(self.rules, relative_path, is_dir)
+
+    def _scan(self, relative_dir):
+        """Yield (relative path, stat) for the files under a directory, watching each directory."""
+        stack = [relative_dir]
+        while stack:
+            directory = stack.pop()
+            if self.watcher and not self.watcher.watch(directory):
+                self.watcher.close()
+                self.watcher = None
+            try:
+                entries = list(os.scandir(os.path.join(self.root, directory) if directory else self.root))
+            except OSError:
+                continue
+            for entry in entries:
+                relative_path = f"{directory}/{entry.name}" if directory else entry.name
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if self._ignored(relative_path, is_dir):
+                    continue
+                if is_dir:
+                    stack.append(relative_path)
+                elif entry.is_file():
+                    yield relative_path, entry.stat()
+
+    def _entry(self, relative_path, stat, previous=None):
+        """Return (mtime_ns, size, digest, text) for a file, reusing previous if its stat is unchanged."""
+        if previous and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+            return previous
+        digest = text = None
+        if stat.st_size <= MAX_HASH_BYTES:
+            try:
+                with open(os.path.join(self.root, relative_path), "rb") as file:
+                    data = file.read()
+            except OSError:
+                data = None
+            if data is not None:
+                digest = hashlib.sha1(data).hexdigest()
+                if self.diffs and len(data) <= MAX_DIFF_SOURCE_BYTES and b"\0" not in data:
+                    text = data.decode("utf-8", errors="replace")
+        return stat.st_mtime_ns, stat.st_size, digest, text
+
+    def _changed_paths(self):
+        """Return the paths to re-check: the watcher's event paths, or None to re-check everything."""
+        if self.watcher is None:
+            return None
+        paths, overflow = self.watcher.read()
+        if overflow:
+            return None
+        candidates = set()
+        for path in paths:
+            full_path = os.path.join(self.root, path)
+            if os.path.isdir(full_path) and not os.path.islink(full_path):
+                if not self._ignored(path, True):
+                    candidates.update(relative_path for relative_path, _ in self._scan(path))
+            elif not self._ignored(path, False):
+                candidates.add(path)
+            # A deleted or moved-away directory takes the files under it along.
+            candidates.update(known for known in self.files if known.startswith(path + "/"))
+        return candidates
+
+    def cursor(self):
+        """Return a new cursor that reports the changes made from now on."""
+        with self.lock:
+            self._refresh()
+            return JournalCursor(self, dict(self.files), self.version())
+
+    def version(self):
+        return self.log_start + len(self.log)
+
+    def changes(self, exclude=()):
+        """Return the changes since the previous call that used no session cursor."""
+        return self.default_cursor.changes(exclude)
+
+    def _refresh(self):
+        """Bring the snapshot up to date and log the paths whose entry changed; call under lock."""
+        paths = self._changed_paths()
+        if paths is None:
+            current = dict(self._scan(""))
+            paths = set(current) | set(self.files)
+        else:
+            current = {}
+            for path in paths:
+                try:
+                    stat = os.stat(os.path.join(self.root, path))
+                except OSError:
+                    continue
+                if os.path.isfile(os.path.join(self.root, path)):
+                    current[path] = stat
+
+        changed = set()
+        for path in paths:
+            previous = self.files.get(path)
+            if path not in current:
+                if previous is not None:
+                    del self.files[path]
+                    changed.add(path)
+                continue
+            entry = self._entry(path, current[path], previous)
+            if entry is not previous:
+                self.files[path] = entry
+                changed.add(path)
+        if changed:
+            self.log.append(changed)
+            if len(self.log) > MAX_LOG_ENTRIES:
+                dropped = len(self.log) - MAX_LOG_ENTRIES
+                del self.log[:dropped]
+                self.log_start += dropped
+
+    @staticmethod
+    def _diff(path, before, after):
+        return "".join(difflib.unified_diff(
+            before.splitlines(keepends=True),
+            after.splitlines(keepends=True),
+            fromfile=f"a/{path}",
+            tofile=f"b/{path}",
+        ))
+
+    @staticmethod
+    def _format(created, modified, deleted, diffs):
+        groups = [("created", created), ("modified", modified), ("deleted", deleted)]
+        listed = [(label, paths) for label, paths in groups if paths]
+        if not listed:
+            return ""
+        lines = []
+        for label, paths in listed:
+            shown = ", ".join(paths[:MAX_LISTED_CHANGES])
+            more = f" and {len(paths) - MAX_LISTED_CHANGES} more" if len(paths) > MAX_LISTED_CHANGES else ""
+            lines.append(f"{label}: {shown}{more}")
+        summary = "[Files changed since the last tool call: " + "; ".join(lines) + "]"
+        diff_text = "".join(diffs)
+        if diff_text:
+            if len(diff_text) > MAX_DIFF_CHARS:
+                diff_text = diff_text[:MAX_DIFF_CHARS] + "\n[...diff truncated; read the files for the rest]\n"
+            summary += "\n" + diff_text.rstrip("\n")
+        return summary
+
+
+class JournalCursor:
+    """One session's position in a ChangeJournal: the file entries it was last told about."""
+
+    def __init__(self, journal, files, version):
+        self.journal = journal
+        self.files = files
+        self.version = version
+
+    def changes(self, exclude=()):
+        """Return a summary of the files created, modified and deleted since the last call.
+
+        Paths in exclude are taken into this cursor without being reported, e.g. the files a
+        write_file call wrote itself. Returns "" when nothing changed.
+        """
+        journal = self.journal
+        with journal.lock:
+            journal._refresh()
+            if self.version < journal.log_start:
+                paths = set(self.files) | set(journal.files)
+            else:
+                paths = set().union(*journal.log[self.version - journal.log_start:])
+            self.version = journal.version()
+
+            created, modified, deleted = [], [], []
+            diffs = []
+            for path in sorted(paths):
+                previous = self.files.get(path)
+                entry = journal.files.get(path)
+                if entry is None:
+                    if previous is not None:
+                        del self.files[path]
+                        if path not in exclude:
+                            deleted.append(path)
+                    continue
+                self.files[path] = entry
+                if path in exclude or entry == previous:
+                    continue
+                if previous is None:
+                    created.append(f"{path} ({entry[1]} bytes)")
+                elif entry[2] is None or entry[2] != previous[2]:
+                    modified.append(f"{path} ({entry[1] - previous[1]:+d} bytes)")
+                    if previous[3] is not None and entry[3] is not None:
+                        diffs.append(journal._diff(path, previous[3], entry[3]))
+
+        return journal._format(created, modified, deleted, diffs)
+
+
+def get_journal(working_directory, diffs=False):
+    """Return the shared journal for a working directory, creating and snapshotting it on first use."""
+    root = os.path.abspath(working_directory)
+    with _journals_lock:
+        if root not in _journals:
+            _journals[root] = ChangeJournal(root, diffs)
+        return _journals[root]
@@ -0,0 +1,18 @@
+import contextvars
+import os
+import time
+
+CACHE_DIR = os.environ.get("GEMINIAGENT_CACHE_DIR", ".agent_cache")
+# Tools that run subprocesses get at least this long even when the session deadline is close.
+MIN_TOOL_TIMEOUT = 1.0
+
+# Monotonic time by which the current tool call has to finish, set from the session budget.
+tool_deadline = contextvars.ContextVar("tool_deadline", default=None)
+
+
+def tool_timeout(default):
+    """Return the timeout in seconds for a subprocess: default, cut short by the tool deadline."""
+    deadline = tool_deadline.get()
+    if deadline is None:
+        return default
+    return max(min(default, deadline - time.monotonic()), MIN_TOOL_TIMEOUT)
@@ -0,0 +1,120 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+
+READ_ONLY_FUNCTIONS = {"get_files_info", "get_file_content", "read_files", "search_files"}
+PATH_ARGS = {
+    "get_files_info": "directory",
+    "get_file_content": "file_path",
+    "search_files": "directory",
+    "write_file": "file_path",
+}
+MAX_WORKERS = 8
+GLOB_CHARS = "*?["
+
+# Shared by every run_ordered call; its threads are started on first use and then reused.
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="dispatch")
+
+
+def written_paths(args):
+    """Return the paths a write_file call writes, including every file of a batch write."""
+    paths = [entry.get("file_path") for entry in args.get("files") or []]
+    if args.get("file_path"):
+        paths.append(args["file_path"])
+    return [path for path in paths if path]
+
+
+def glob_base(pattern):
+    """Return the directory part of a path pattern before its first glob character."""
+    parts = []
+    for part in pattern.replace(os.sep, "/").split("/"):
+        if any(char in part for char in GLOB_CHARS):
+            break
+        parts.append(part)
+    return "/".join(parts) or "."
+
+
+def call_access(function_name, args):
+    """Return (reads, writes) path sets for a call; writes is None if the call may touch anything."""
+    if function_name not in PATH_ARGS and function_name != "read_files":
+        return set(), None
+    if function_name == "write_file":
+        return set(), {os.path.normpath(path) for path in written_paths(args)}
+    if function_name == "read_files":
+        return {os.path.normpath(glob_base(path)) for path in args.get("paths") or ["."]}, set()
+
+    path = os.path.normpath(args.get(PATH_ARGS[function_name]) or ".")
+    if function_name in READ_ONLY_FUNCTIONS:
+        return {path}, set()
+    return set(), {path}
+
+
+def paths_overlap(a, b):
+    if a == "." or b == "." or a == b:
+        return True
+    return a.startswith(b + os.sep) or b.startswith(a + os.sep)
+
+
+def calls_conflict(first, second):
+    first_reads, first_writes = first
+    second_reads, second_writes = second
+    if first_writes is None or second_writes is None:
+        return True
+
+    for written in first_writes:
+        if any(paths_overlap(written, path) for path in second_reads | second_writes):
+            return True
+    for written in second_writes:
+        if any(paths_overlap(written, path) for path in first_reads):
+            return True
+    return False
+
+
+def _run_after(dependencies, run, index):
+    wait(dependencies)
+    return run(index)
+
+
+def run_ordered(calls, run):
+    """Run calls concurrently, keeping conflicting calls in their original order.
+
+    calls is a list of (function_name, args) pairs and run(index) executes one of them.
+    Results are returned in the same order as calls. A single read-only call runs inline.
+    """
+    if len(calls) == 1 and calls[0][0] in READ_ONLY_FUNCTIONS:
+        return [run(0)]
+
+    access = [call_access(name, args) for name, args in calls]
+    futures = []
+    for index in range(len(calls)):
+        # A call only waits on futures submitted before it, which the executor's FIFO queue
+        # has already handed to a worker, so waiting in a worker cannot starve the pool.
+        dependencies = [
+            futures[earlier]
+            for earlier in range(index)
+            if calls_conflict(access[earlier], access[index])
+        ]
+        # Like asyncio.to_thread, run each call in a copy of the caller's context.
+        futures.append(executor.submit(contextvars.copy_context().run, _run_after, dependencies, run, index))
+    return [future.result() for future in futures]
+
+
+class AsyncDispatcher:
+    """Start function calls as soon as they arrive, keeping conflicting calls ordered."""
+
+    def __init__(self):
+        self.started = []
+
+    def submit(self, function_name, args, run):
+        """Schedule run() on a worker thread after any earlier conflicting call; returns the task."""
+        access = call_access(function_name, args)
+        dependencies = [task for earlier, task in self.started if calls_conflict(earlier, access)]
+        task = asyncio.ensure_future(self._run_after(dependencies, run))
+        self.started.append((access, task))
+        return task
+
+    async def _run_after(self, dependencies, run):
+        if dependencies:
+            await asyncio.wait(dependencies)
+        return await asyncio.to_thread(run)
@@ -0,0 +1,271 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+from functions.config import CACHE_DIR
+from functions.get_files_info import _gitignore_rules, _is_ignored
+
+MAX_INDEXED_BYTES = 2 * 1024 * 1024
+SNIFF_BYTES = 8192
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+QUANTIFIER = re.compile(r"\*|\+|\?|\{\d*(?:,\d*)?\}")
+# What follows an escape letter as part of the same escape, e.g. the 41 of \x41.
+ESCAPE_ARGUMENTS = {
+    "x": re.compile(r"[0-9a-fA-F]{0,2}"),
+    "u": re.compile(r"[0-9a-fA-F]{0,4}"),
+    "U": re.compile(r"[0-9a-fA-F]{0,8}"),
+    "N": re.compile(r"(?:\{[^}]*\})?"),
+    "0": re.compile(r"\d{0,2}"),
+}
+
+
+def _skip_class(pattern, index):
+    """Return the index just past the character class starting at pattern[index] == "["."""
+    index += 1
+    if index < len(pattern) and pattern[index] == "^":
+        index += 1
+    if index < len(pattern) and pattern[index] == "]":
+        index += 1
+    while index < len(pattern) and pattern[index] != "]":
+        index += 2 if pattern[index] == "\\" else 1
+    if index >= len(pattern):
+        raise ValueError("unterminated character class")
+    return index + 1
+
+
+def _skip_group(pattern, index):
+    """Return the index just past the group starting at pattern[index] == "("."""
+    depth = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char == "[":
+            index = _skip_class(pattern, index)
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return index + 1
+        index += 1
+    raise ValueError("unbalanced parenthesis")
+
+
+def required_literals(pattern):
+    """Return substrings every match of a regex must contain, or [] if none can be derived.
+
+    Only the top level of the pattern is read: runs of plain characters are required unless a
+    quantifier makes their last character optional, while groups, classes, escapes like \\d and
+    quantified atoms end a run. A top-level alternation, verbose mode or anything this small
+    parser does not understand gives [], which means every file is scanned.
+    """
+    literals = []
+    current = []
+    index = 0
+    try:
+        while index < len(pattern):
+            char = pattern[index]
+            quantifier = QUANTIFIER.match(pattern, index)
+            if quantifier:
+                # The quantified atom is optional or repeated; only what came before it is fixed.
+                if current:
+                    current.pop()
+                literals.append("".join(current))
+                current = []
+                index = quantifier.end()
+                if index < len(pattern) and pattern[index] in "?+":
+                    index += 1
+                continue
+            if char == "|" or char == ")":
+                return []
+            if char == "\\":
+                escaped = pattern[index + 1:index + 2]
+                if not escaped:
+                    return []
+                index += 2
+                if escaped.isalnum() or escaped == "_":
+                    literals.append("".join(current))
+                    current = []
+                    argument = ESCAPE_ARGUMENTS.get("0" if escaped.isdigit() else escaped)
+                    if argument:
+                        index = argument.match(pattern, index).end()
+                else:
+                    current.append(escaped)
+                continue
+            if char == "[":
+                literals.append("".join(current))
+                current = []
+                index = _skip_class(pattern, index)
+                continue
+            if char == "(":
+                end = _skip_group(pattern, index)
+                flags = re.match(r"\(\?([a-zA-Z]+)\)", pattern[index:end])
+                if flags and "x" in flags.group(1):
+                    return []
+                literals.append("".join(current))
+                current = []
+                index = end
+                continue
+            if char in ".^$":
+                literals.append("".join(current))
+                current = []
+            else:
+                current.append(char)
+            index += 1
+    except ValueError:
+        return []
+    literals.append("".join(current))
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+def _is_binary(path):
+    with open(path, "rb") as file:
+        return b"\0" in file.read(SNIFF_BYTES)
+
+
+class FileIndex:
+    """On-disk trigram index of the text files under a working directory.
+
+    The index is refreshed incrementally: only files whose mtime or size changed since the
+    last refresh are re-read, and write_file updates the written file directly. Files that
+    are too large to index are kept as unindexed and always scanned.
+    """
+
+    def __init__(self, working_directory, path=None):
+        self.root = os.path.abspath(working_directory)
+        if path is None:
+            digest = hashlib.sha1(self.root.encode()).hexdigest()[:12]
+            path = os.path.join(CACHE_DIR, f"search_index_{digest}.sqlite")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "id INTEGER PRIMARY KEY, path TEXT UNIQUE, mtime_ns INTEGER, size INTEGER, indexed INTEGER);"
+            "CREATE TABLE IF NOT EXISTS trigrams ("
+            "trigram TEXT, file_id INTEGER, PRIMARY KEY (trigram, file_id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS trigrams_file ON trigrams (file_id);"
+        )
+
+    def _scan(self):
+        """Yield (relative path, stat) for every file under the root, honoring .gitignore."""
+        stack = [(self.root, _gitignore_rules(self.root, self.root))]
+        prefix_length = len(os.path.join(self.root, ""))
+        while stack:
+            directory, rules = stack.pop()
+            try:
+                scanned = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in scanned:
+                relative_path = entry.path[prefix_length:].replace(os.sep, "/")
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if entry.name == ".git" or _is_ignored(rules, relative_path, is_dir):
+                    continue
+                if is_dir:
+                    stack.append((entry.path, rules + _gitignore_rules(entry.path, self.root)))
+                elif entry.is_file():
+                    yield relative_path, entry.stat()
+
+    def _index_file(self, relative_path, stat):
+        full_path = os.path.join(self.root, relative_path)
+        indexed = stat.st_size <= MAX_INDEXED_BYTES
+        grams = set()
+        try:
+            if indexed and not _is_binary(full_path):
+                with open(full_path, encoding="utf-8", errors="replace") as file:
+                    grams = trigrams(file.read())
+        except OSError:
+            return
+
+        self._remove_file(relative_path)
+        cursor = self.db.execute(
+            "INSERT INTO files (path, mtime_ns, size, indexed) VALUES (?, ?, ?, ?)",
+            (relative_path, stat.st_mtime_ns, stat.st_size, int(indexed)),
+        )
+        self.db.executemany(
+            "INSERT OR IGNORE INTO trigrams VALUES (?, ?)",
+            [(gram, cursor.lastrowid) for gram in grams],
+        )
+
+    def _remove_file(self, relative_path):
+        row = self.db.execute("SELECT id FROM files WHERE path = ?", (relative_path,)).fetchone()
+        if row:
+            self.db.execute("DELETE FROM trigrams WHERE file_id = ?", row)
+            self.db.execute("DELETE FROM files WHERE id = ?", row)
+
+    def refresh(self):
+        """Re-index files whose mtime or size changed and drop deleted files; returns files re-read."""
+        with self.lock:
+            known = {
+                path: (mtime_ns, size)
+                for path, mtime_ns, size in self.db.execute("SELECT path, mtime_ns, size FROM files")
+            }
+            changed = 0
+            for relative_path, stat in self._scan():
+                if known.pop(relative_path, None) != (stat.st_mtime_ns, stat.st_size):
+                    self._index_file(relative_path, stat)
+                    changed += 1
+            for relative_path in known:
+                self._remove_file(relative_path)
+            self.db.commit()
+            return changed
+
+    def update_file(self, full_path):
+        """Re-index a single file right after it was written."""
+        relative_path = os.path.relpath(os.path.abspath(full_path), self.root).replace(os.sep, "/")
+        with self.lock:
+            try:
+                self._index_file(relative_path, os.stat(full_path))
+            except OSError:
+                self._remove_file(relative_path)
+            self.db.commit()
+
+    def candidates(self, literals):
+        """Return sorted relative paths that may contain all the given literals."""
+        grams = set()
+        for literal in literals:
+            grams |= trigrams(literal)
+
+        with self.lock:
+            if not grams:
+                rows = self.db.execute("SELECT path FROM files")
+            else:
+                placeholders = ", ".join("?" for _ in grams)
+                rows = self.db.execute(
+                    "SELECT path FROM files WHERE indexed = 0 OR id IN ("
+                    f"SELECT file_id FROM trigrams WHERE trigram IN ({placeholders}) "
+                    "GROUP BY file_id HAVING COUNT(*) = ?)",
+                    (*grams, len(grams)),
+                )
+            return sorted(path for (path,) in rows)
+
+
+def get_index(working_directory):
+    """Return the shared FileIndex for a working directory, opening it on first use."""
+    root = os.path.abspath(working_directory)
+    with _indexes_lock:
+        if root not in _indexes:
+            _indexes[root] = FileIndex(root)
+        return _indexes[root]
+
+
+def notify_write(working_directory, full_path):
+    """Update an already opened index after write_file changed a file."""
+    index = _indexes.get(os.path.abspath(working_directory))
+    if index:
+        index.update_file(full_path)
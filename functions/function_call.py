@@ -2,7 +2,10 @@ from google.genai import types
 from functions.get_files_info import schema_get_files_info, get_files_info
 from functions.write_file import schema_write_file, write_file
 from functions.get_file_content import schema_get_file_content, get_file_content
+from functions.read_files import schema_read_files, read_files
 from functions.run_python_file import schema_run_python_file, run_python_file
+from functions.search_files import schema_search_files, search_files
+from functions.run_tests import schema_run_tests, run_tests
 
 
 available_functions = types.Tool(
@@ -10,7 +13,10 @@ available_functions = types.Tool(
         schema_get_files_info,
         schema_write_file,
         schema_get_file_content,
+        schema_read_files,
         schema_run_python_file,
+        schema_search_files,
+        schema_run_tests,
     ]
 )
 
@@ -18,5 +24,8 @@ function_map = {
     "get_files_info": get_files_info,
     "write_file": write_file,
     "get_file_content": get_file_content,
+    "read_files": read_files,
     "run_python_file": run_python_file,
+    "search_files": search_files,
+    "run_tests": run_tests,
 }
\ No newline at end of file
@@ -1,10 +1,14 @@
 from pathlib import Path
 import os
 from google.genai import types
+from functions.tracing import tracer
+
+MAX_CHARS = 10000
+READ_CHUNK = 65536
 
 schema_get_file_content = types.FunctionDeclaration(
     name="get_file_content",
-    description="Read file contents, constrained to the working directory.",
+    description=f"Read file contents, constrained to the working directory. At most {MAX_CHARS} characters are returned per call; use offset/limit to page through larger files.",
     parameters=types.Schema(
         type=types.Type.OBJECT,
         properties={
@@ -12,31 +16,127 @@ schema_get_file_content = types.FunctionDeclaration(
                 type=types.Type.STRING,
                 description="The path to the file to read from, relative to the working directory.",
             ),
+            "offset": types.Schema(
+                type=types.Type.INTEGER,
+                description="Optional zero-based line (or byte, see unit) to start reading from.",
+            ),
+            "limit": types.Schema(
+                type=types.Type.INTEGER,
+                description="Optional maximum number of lines (or bytes, see unit) to read; at least 1.",
+            ),
+            "unit": types.Schema(
+                type=types.Type.STRING,
+                enum=["lines", "bytes"],
+                description='Unit of offset and limit, either "lines" (default) or "bytes".',
+            ),
         },
         required=["file_path"],
     ),
 )
 
 
-def get_file_content(working_directory, file_path) -> str:
+def _skip_lines(file, count):
+    """Advance past count lines without holding a whole long line in memory."""
+    skipped = 0
+    while skipped < count:
+        chunk = file.readline(READ_CHUNK)
+        if not chunk:
+            break
+        if chunk.endswith("\n"):
+            skipped += 1
+    return skipped
+
+
+def _read_lines(file, offset, limit):
+    """Return (text, next line, more) for a line window capped at MAX_CHARS characters."""
+    if _skip_lines(file, offset) < offset:
+        return "", offset, False
+
+    chunks = []
+    size = 0
+    line_number = offset
+    while limit is None or line_number < offset + limit:
+        line = file.readline(MAX_CHARS - size + 1)
+        if not line:
+            return "".join(chunks), line_number, False
+        if size + len(line) > MAX_CHARS:
+            chunks.append(line[:MAX_CHARS - size])
+            return "".join(chunks), line_number, True
+        chunks.append(line)
+        size += len(line)
+        if line.endswith("\n"):
+            line_number += 1
+    return "".join(chunks), line_number, bool(file.read(1))
+
+
+def _decode_window(data):
+    """Decode a byte window, dropping UTF-8 sequences split by the window edges.
+
+    Returns (text, end) where end is the index in data just past the last decoded byte,
+    so a dropped trailing sequence is read again by the next window.
+    """
+    start = 0
+    while start < min(3, len(data)) and data[start] & 0xC0 == 0x80:
+        start += 1
+    window = data[start:]
+    try:
+        return window.decode("utf-8"), len(data)
+    except UnicodeDecodeError as e:
+        if e.start < len(window) - 3:
+            raise
+        return window[:e.start].decode("utf-8"), start + e.start
+
+
+def get_file_content(working_directory, file_path, offset=None, limit=None, unit="lines") -> str:
     try:
         working_dir_abs_path = os.path.abspath(working_directory)
-        file_path = os.path.join(working_dir_abs_path, file_path)
+        file_path = os.path.normpath(os.path.join(working_dir_abs_path, file_path))
 
-        if not file_path.startswith(working_dir_abs_path):
+        if not file_path.startswith(working_dir_abs_path + os.sep):
             return f'Error: Cannot read "{file_path}" as it is outside the permitted working directory'
         if not Path(file_path).is_file():
             return f'Error: File not found or is not a regular file: "{file_path}"'
+        if unit not in ("lines", "bytes"):
+            return f'Error: Invalid unit "{unit}", expected "lines" or "bytes"'
+
+        total_size = os.path.getsize(file_path)
+        offset = max(int(offset or 0), 0)
+        limit = None if limit is None else int(limit)
+        if limit is not None and limit < 1:
+            return f"Error: limit must be at least 1, got {limit}"
+
+        if unit == "bytes":
+            with open(file_path, "rb") as file:
+                file.seek(offset)
+                data = file.read(min(limit if limit is not None else MAX_CHARS, MAX_CHARS))
+            tracer.record(bytes_read=len(data))
+            try:
+                file_content, decoded = _decode_window(data)
+            except UnicodeDecodeError:
+                return f'Error: Cannot read "{file_path}" due to encoding issues'
+            # A window too small for even one character still has to move forward.
+            end = offset + (decoded or len(data))
+            if end < total_size:
+                file_content += f'[...File "{file_path}" truncated: showed bytes {offset}-{end} of {total_size}; continue with offset={end} unit="bytes"]'
+            return file_content
 
-        file_content = ""
         with open(file_path, "r", encoding="utf-8") as file:
             try:
-                file_content = file.read()
+                if offset == 0 and limit is None:
+                    file_content = file.read(MAX_CHARS + 1)
+                    tracer.record(bytes_read=file.tell())
+                    if len(file_content) > MAX_CHARS:
+                        file_content = file_content[:MAX_CHARS] + f'[...File "{file_path}" truncated at {MAX_CHARS} characters of {total_size} bytes; pass offset and limit to read further]'
+                    return file_content
+                file_content, next_line, more = _read_lines(file, offset, limit)
+                tracer.record(bytes_read=file.buffer.tell())
             except UnicodeDecodeError:
                 return f'Error: Cannot read "{file_path}" due to encoding issues'
 
-        if len(file_content) > 10000:
-            file_content = file_content[:10000] + f'[...File "{file_path}"'
+        if more and next_line == offset:
+            file_content += f'[...File "{file_path}": line {offset} is longer than {MAX_CHARS} characters; read it with unit="bytes"]'
+        elif more:
+            file_content += f'[...File "{file_path}" truncated: showed lines {offset}-{next_line} of a {total_size}-byte file; continue with offset={next_line} unit="lines"]'
         return file_content
     except Exception as e:
         return f"Error: {e}"
@@ -1,11 +1,17 @@
 from pathlib import Path
+from fnmatch import fnmatch
+from itertools import islice
 import os
+import re
 from google.genai import types
+from functions.tracing import tracer
+
+PAGE_SIZE = 200
 
 
 schema_get_files_info = types.FunctionDeclaration(
     name="get_files_info",
-    description="Lists files in the specified directory along with their sizes, constrained to the working directory.",
+    description="Lists files in the specified directory along with their sizes, constrained to the working directory. Can walk subdirectories, filter by glob and page through large listings.",
     parameters=types.Schema(
         type=types.Type.OBJECT,
         properties={
@@ -13,28 +19,149 @@ schema_get_files_info = types.FunctionDeclaration(
                 type=types.Type.STRING,
                 description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
             ),
+            "recursive": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Whether to list subdirectories recursively. Defaults to false.",
+            ),
+            "max_depth": types.Schema(
+                type=types.Type.INTEGER,
+                description="Optional maximum depth to descend to, where 1 lists only the directory itself. Implies recursive.",
+            ),
+            "include": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(type=types.Type.STRING),
+                description='Optional glob patterns a file must match to be listed, e.g. ["*.py"].',
+            ),
+            "exclude": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(type=types.Type.STRING),
+                description="Optional glob patterns of files and directories to skip.",
+            ),
+            "respect_gitignore": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Whether to skip paths ignored by .gitignore files. Defaults to true.",
+            ),
+            "cursor": types.Schema(
+                type=types.Type.INTEGER,
+                description="Optional cursor returned by a previous truncated listing to continue from.",
+            ),
         },
     ),
 )
 
 
-def get_files_info(working_directory, directory=None) -> str:
+def _gitignore_rules(directory, base):
+    """Parse directory/.gitignore into (regex, negated, directory_only) rules relative to base."""
+    rules = []
+    try:
+        with open(os.path.join(directory, ".gitignore"), encoding="utf-8") as file:
+            lines = file.read().splitlines()
+    except (OSError, UnicodeDecodeError):
+        return rules
+
+    prefix = os.path.relpath(directory, base).replace(os.sep, "/")
+    prefix = "" if prefix == "." else prefix + "/"
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        negated = line.startswith("!")
+        line = line.lstrip("!")
+        directory_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        pattern = re.escape(line.lstrip("/")).replace(r"\*\*/", "(?:.*/)?").replace(r"\*\*", ".*")
+        pattern = pattern.replace(r"\*", "[^/]*").replace(r"\?", "[^/]")
+        pattern = re.escape(prefix) + ("" if anchored else "(?:.*/)?") + pattern
+        rules.append((re.compile(pattern + "$"), negated, directory_only))
+    return rules
+
+
+def _is_ignored(rules, relative_path, is_dir):
+    ignored = False
+    for regex, negated, directory_only in rules:
+        if directory_only and not is_dir:
+            continue
+        if regex.match(relative_path):
+            ignored = not negated
+    return ignored
+
+
+def _matches(patterns, relative_path, name):
+    return any(fnmatch(relative_path, pattern) or fnmatch(name, pattern) for pattern in patterns)
+
+
+def _walk(root, max_depth, include, exclude, respect_gitignore):
+    """Yield one listing line per entry using a single scandir pass per directory.
+
+    A subdirectory or entry that cannot be read is listed as "<unreadable>" and the walk goes on.
+    """
+    stack = [(root, 1, _gitignore_rules(root, root) if respect_gitignore else [])]
+    prefix_length = len(os.path.join(root, ""))
+    while stack:
+        directory, depth, rules = stack.pop()
+        try:
+            with os.scandir(directory) as scanned:
+                entries = sorted(scanned, key=lambda entry: entry.name)
+        except OSError:
+            if directory == root:
+                raise
+            yield f"- {directory[prefix_length:].replace(os.sep, '/')}/: <unreadable>"
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            relative_path = entry.path[prefix_length:].replace(os.sep, "/")
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                yield f"- {relative_path}: <unreadable>"
+                continue
+            if respect_gitignore and (entry.name == ".git" or _is_ignored(rules, relative_path, is_dir)):
+                continue
+            if exclude and _matches(exclude, relative_path, entry.name):
+                continue
+
+            if is_dir:
+                yield f"- {relative_path}/"
+                if (max_depth is None or depth < max_depth) and not entry.is_symlink():
+                    subdirectories.append(entry.path)
+            elif not include or _matches(include, relative_path, entry.name):
+                try:
+                    yield f"- {relative_path}: {entry.stat().st_size} bytes"
+                except OSError:
+                    yield f"- {relative_path}: <unreadable>"
+
+        for subdirectory in reversed(subdirectories):
+            child_rules = rules + _gitignore_rules(subdirectory, root) if respect_gitignore else []
+            stack.append((subdirectory, depth + 1, child_rules))
+
+
+def get_files_info(working_directory, directory=None, recursive=False, max_depth=None, include=None, exclude=None, respect_gitignore=True, cursor=None) -> str:
     try:
         working_dir_abs_path = os.path.abspath(working_directory)
         target_dir = working_dir_abs_path
 
         if directory:
-            target_dir = os.path.join(working_dir_abs_path, directory)
-        if not target_dir.startswith(working_dir_abs_path):
+            target_dir = os.path.normpath(os.path.join(working_dir_abs_path, directory))
+        if target_dir != working_dir_abs_path and not target_dir.startswith(working_dir_abs_path + os.sep):
             return f'Error: Cannot list "{directory}" as it is outside the permitted working directory'
         if not Path(target_dir).is_dir():
             return f'Error: "{directory}" is not a directory'
+
+        if max_depth is not None:
+            max_depth = max(int(max_depth), 1)
+        elif not recursive:
+            max_depth = 1
+        cursor = max(int(cursor or 0), 0)
+        include = [include] if isinstance(include, str) else include or []
+        exclude = [exclude] if isinstance(exclude, str) else exclude or []
         try:
-            dir_elements = os.listdir(target_dir)
-            result = [
-                f"- {os.path.basename(element)}: file_size={os.path.getsize(os.path.join(target_dir, element))} bytes, is_dir={os.path.isdir(os.path.join(target_dir, element))}"
-                for element in dir_elements
-            ]
+            entries = _walk(target_dir, max_depth, include, exclude, respect_gitignore)
+            result = list(islice(entries, cursor, cursor + PAGE_SIZE + 1))
+            tracer.record(entries_listed=len(result))
+            if len(result) > PAGE_SIZE:
+                result[PAGE_SIZE:] = [f"[...more entries; continue with cursor={cursor + PAGE_SIZE}]"]
             return "\n".join(result)
         except Exception as e:
             return f"Error listing files: {e}"
@@ -0,0 +1,93 @@
+import os
+import selectors
+import subprocess
+import sys
+import time
+from collections import deque
+
+MAX_OUTPUT_BYTES = 16384
+READ_CHUNK = 65536
+
+
+class HeadTailBuffer:
+    """Keeps the first and last max_bytes / 2 bytes of a stream and counts what was dropped."""
+
+    def __init__(self, max_bytes=MAX_OUTPUT_BYTES):
+        self.head_limit = max_bytes // 2
+        self.tail_limit = max_bytes - self.head_limit
+        self.head = bytearray()
+        self.tail = deque()
+        self.tail_size = 0
+        self.elided = 0
+
+    def write(self, data):
+        if len(self.head) < self.head_limit:
+            taken = self.head_limit - len(self.head)
+            self.head += data[:taken]
+            data = data[taken:]
+        if not data:
+            return
+
+        self.tail.append(data)
+        self.tail_size += len(data)
+        while self.tail_size - len(self.tail[0]) >= self.tail_limit:
+            self.tail_size -= len(self.tail[0])
+            self.elided += len(self.tail.popleft())
+        if self.tail_size > self.tail_limit:
+            extra = self.tail_size - self.tail_limit
+            self.tail[0] = self.tail[0][extra:]
+            self.tail_size -= extra
+            self.elided += extra
+
+    def text(self):
+        tail = b"".join(self.tail)
+        if not self.elided:
+            return (bytes(self.head) + tail).decode("utf-8", errors="replace")
+        return (
+            bytes(self.head).decode("utf-8", errors="replace")
+            + f"\n[... {self.elided} bytes elided ...]\n"
+            + tail.decode("utf-8", errors="replace")
+        )
+
+
+def run_captured(cmd, cwd, timeout, max_bytes=MAX_OUTPUT_BYTES, echo=False):
+    """Like subprocess.run(capture_output=True, text=True), but with bounded memory.
+
+    stdout and stderr are read incrementally into HeadTailBuffers holding at most max_bytes
+    each, and are optionally echoed to the console as they arrive.
+    """
+    process = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout, stderr = HeadTailBuffer(max_bytes), HeadTailBuffer(max_bytes)
+    buffers = {
+        process.stdout.fileno(): (stdout, sys.stdout),
+        process.stderr.fileno(): (stderr, sys.stderr),
+    }
+    deadline = time.monotonic() + timeout
+    try:
+        with selectors.DefaultSelector() as selector:
+            selector.register(process.stdout, selectors.EVENT_READ)
+            selector.register(process.stderr, selectors.EVENT_READ)
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+                for key, _ in selector.select(remaining):
+                    chunk = os.read(key.fd, READ_CHUNK)
+                    if not chunk:
+                        selector.unregister(key.fileobj)
+                        continue
+                    buffer, console = buffers[key.fd]
+                    buffer.write(chunk)
+                    if echo:
+                        console.buffer.write(chunk)
+                        console.flush()
+        returncode = process.wait(timeout=max(deadline - time.monotonic(), 0))
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+
+    return subprocess.CompletedProcess(cmd, returncode, stdout.text(), stderr.text())
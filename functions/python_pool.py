@@ -0,0 +1,156 @@
+import atexit
+import json
+import os
+import queue
+import select
+import subprocess
+import time
+
+from functions.output_capture import MAX_OUTPUT_BYTES, READ_CHUNK, HeadTailBuffer
+
+POOL_SIZE = 2
+MAX_RUNS_PER_WORKER = 50
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_worker.py")
+
+
+class Worker:
+    """One pre-warmed interpreter running python_worker.py, talking over pipes.
+
+    Jobs go in and return codes come back on one pair of pipes; the job's stdout and stderr
+    arrive on two more and are read into HeadTailBuffers while the job runs, so a chatty
+    script costs at most max_bytes of memory and nothing on disk.
+    """
+
+    def __init__(self):
+        job_read, self.job_write = os.pipe()
+        self.result_read, result_write = os.pipe()
+        self.stdout_read, stdout_write = os.pipe()
+        self.stderr_read, stderr_write = os.pipe()
+        child_fds = (job_read, result_write, stdout_write, stderr_write)
+        self.process = subprocess.Popen(
+            ["python3", WORKER_SCRIPT, *map(str, child_fds)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            pass_fds=child_fds,
+        )
+        for fd in child_fds:
+            os.close(fd)
+        os.set_blocking(self.stdout_read, False)
+        os.set_blocking(self.stderr_read, False)
+        self.runs = 0
+        self.buffer = b""
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def drain(self, buffers):
+        """Move whatever output is waiting in the pipes into buffers (None discards it)."""
+        for fd, buffer in zip((self.stdout_read, self.stderr_read), buffers):
+            while True:
+                try:
+                    chunk = os.read(fd, READ_CHUNK)
+                except BlockingIOError:
+                    break
+                if not chunk:
+                    break
+                if buffer is not None:
+                    buffer.write(chunk)
+
+    def run(self, job, timeout, stdout, stderr):
+        """Send a job and wait for its return code; raises TimeoutError or EOFError."""
+        # Output a background thread of the previous job printed after it finished.
+        self.drain((None, None))
+        os.write(self.job_write, (json.dumps(job) + "\n").encode())
+        self.runs += 1
+        deadline = time.monotonic() + timeout
+        try:
+            while b"\n" not in self.buffer:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError
+                ready = select.select([self.result_read, self.stdout_read, self.stderr_read], [], [], remaining)[0]
+                if not ready:
+                    raise TimeoutError
+                if self.stdout_read in ready or self.stderr_read in ready:
+                    self.drain((stdout, stderr))
+                if self.result_read in ready:
+                    chunk = os.read(self.result_read, 4096)
+                    if not chunk:
+                        raise EOFError
+                    self.buffer += chunk
+        finally:
+            self.drain((stdout, stderr))
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return json.loads(line)["returncode"]
+
+    def close(self):
+        for fd in (self.job_write, self.result_read, self.stdout_read, self.stderr_read):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+
+class PythonPool:
+    """Pool of warm workers that run Python files with the same contract as subprocess.run.
+
+    Workers are retired after max_runs jobs, when a job times out and when they crash. A
+    retired worker leaves an empty slot that the next run fills with a fresh worker, so a
+    dead worker is never handed out again.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_runs=MAX_RUNS_PER_WORKER):
+        self.max_runs = max_runs
+        self.idle = queue.Queue()
+        for _ in range(size):
+            self.idle.put(Worker())
+        atexit.register(self.close)
+
+    def get(self):
+        """Take an idle worker, starting a new one for an empty slot or one that died while idle."""
+        worker = self.idle.get()
+        if worker is not None and worker.alive():
+            return worker
+        if worker is not None:
+            worker.close()
+        try:
+            return Worker()
+        except BaseException:
+            self.idle.put(None)
+            raise
+
+    def run(self, cmd, target_file, args, cwd, timeout, max_bytes=MAX_OUTPUT_BYTES):
+        """Run target_file in a worker and return a subprocess.CompletedProcess for cmd."""
+        worker = self.get()
+        stdout, stderr = HeadTailBuffer(max_bytes), HeadTailBuffer(max_bytes)
+        job = {"path": str(target_file), "args": list(args), "cwd": str(cwd)}
+        try:
+            try:
+                try:
+                    returncode = worker.run(job, timeout, stdout, stderr)
+                except BrokenPipeError:
+                    worker.close()
+                    worker = Worker()
+                    returncode = worker.run(job, timeout, stdout, stderr)
+            except TimeoutError:
+                worker.close()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            except EOFError:
+                worker.close()
+                returncode = worker.process.returncode
+
+            if worker.runs >= self.max_runs:
+                worker.close()
+            return subprocess.CompletedProcess(cmd, returncode, stdout.text(), stderr.text())
+        finally:
+            self.idle.put(worker if worker.alive() else None)
+
+    def close(self):
+        while not self.idle.empty():
+            worker = self.idle.get()
+            if worker is not None:
+                worker.close()
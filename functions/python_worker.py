@@ -0,0 +1,87 @@
+"""Long-lived worker that runs Python files in-process for functions.python_pool.
+
+Started as `python3 python_worker.py <job fd> <result fd> <stdout fd> <stderr fd>`. Each job is
+one JSON line naming the script, its arguments and the working directory; the reply is one JSON
+line with the return code, written after the job's output has been flushed to the stdout and
+stderr pipes. Modules imported by a job are dropped afterwards so the next job sees fresh copies
+of the user's code, while the warm standard library stays loaded.
+
+Isolation is limited to what can be undone cheaply: sys.modules entries, argv, sys.path, the
+environment and the working directory are restored after each job. Changes a job makes inside
+modules that were already loaded, such as monkeypatching json.dumps or adding a logging
+handler, stay in that worker until it is retired after max_runs jobs. Scripts that depend on
+a pristine interpreter should run without --warm-python.
+"""
+import json
+import os
+import runpy
+import sys
+import traceback
+
+WARM_MODULES = [
+    "argparse", "collections", "dataclasses", "datetime", "functools", "itertools",
+    "json", "math", "pathlib", "re", "subprocess", "typing", "unittest",
+]
+
+
+def run_job(job):
+    saved_modules = dict(sys.modules)
+    saved_argv, saved_path, saved_cwd = sys.argv, list(sys.path), os.getcwd()
+    saved_environ = dict(os.environ)
+
+    try:
+        os.chdir(job["cwd"])
+        sys.argv = [job["path"]] + job["args"]
+        sys.path[0] = os.path.dirname(job["path"])
+        runpy.run_path(job["path"], run_name="__main__")
+        returncode = 0
+    except SystemExit as e:
+        if e.code is None:
+            returncode = 0
+        elif isinstance(e.code, int):
+            returncode = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            returncode = 1
+    except BaseException as e:
+        tb = e.__traceback__
+        while tb and tb.tb_frame.f_code.co_filename != job["path"]:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        returncode = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+    for name in set(sys.modules) - set(saved_modules):
+        del sys.modules[name]
+    # Undo jobs that replaced a loaded module, e.g. sys.modules["json"] = fake.
+    for name, module in saved_modules.items():
+        if sys.modules.get(name) is not module:
+            sys.modules[name] = module
+    sys.argv, sys.path[:] = saved_argv, saved_path
+    os.environ.clear()
+    os.environ.update(saved_environ)
+    os.chdir(saved_cwd)
+    return returncode
+
+
+def main():
+    for name in WARM_MODULES:
+        __import__(name)
+
+    jobs = os.fdopen(int(sys.argv[1]), "r")
+    results = os.fdopen(int(sys.argv[2]), "w")
+    # Everything jobs print goes to the output pipes the pool reads while they run.
+    os.dup2(int(sys.argv[3]), 1)
+    os.dup2(int(sys.argv[4]), 2)
+    os.close(int(sys.argv[3]))
+    os.close(int(sys.argv[4]))
+    for line in jobs:
+        returncode = run_job(json.loads(line))
+        results.write(json.dumps({"returncode": returncode}) + "\n")
+        results.flush()
+
+
+if __name__ == "__main__":
+    main()
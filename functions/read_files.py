@@ -0,0 +1,140 @@
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+from google.genai import types
+
+from functions.dispatch import GLOB_CHARS
+from functions.get_file_content import _decode_window
+from functions.tracing import tracer
+
+MAX_TOTAL_BYTES = 40000
+MAX_FILES = 50
+# Read first from every file: enough to spot binary content, and the whole of most small files.
+SNIFF_BYTES = 4096
+MAX_WORKERS = 8
+
+schema_read_files = types.FunctionDeclaration(
+    name="read_files",
+    description=f"Read several files at once, constrained to the working directory. Paths may be globs such as pkg/*.py or **/*.md. One budget of {MAX_TOTAL_BYTES} bytes is shared by all files: small files are returned whole and larger ones split what is left. Binary and non-UTF-8 files are skipped.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "paths": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(type=types.Type.STRING),
+                description=f"File paths or glob patterns, relative to the working directory. At most {MAX_FILES} files are read.",
+            ),
+            "max_bytes": types.Schema(
+                type=types.Type.INTEGER,
+                description=f"Optional total byte budget for all files (default and cap {MAX_TOTAL_BYTES}; about 4 bytes per token).",
+            ),
+        },
+        required=["paths"],
+    ),
+)
+
+
+def _expand(root, patterns):
+    """Return (relative paths of the matched files, skipped (path, reason) pairs)."""
+    files = []
+    skipped = []
+    seen = set()
+    for pattern in patterns:
+        if any(char in pattern for char in GLOB_CHARS):
+            matches = sorted(glob.glob(pattern, root_dir=root, recursive=True))
+            if not matches:
+                skipped.append((pattern, "no matching files"))
+        else:
+            matches = [pattern]
+
+        for match in matches:
+            full_path = os.path.normpath(os.path.join(root, match))
+            relative_path = full_path[len(root) + 1:]
+            if not full_path.startswith(root + os.sep):
+                skipped.append((match, "outside the permitted working directory"))
+            elif relative_path in seen:
+                continue
+            elif os.path.isfile(full_path):
+                seen.add(relative_path)
+                files.append(relative_path)
+            elif match == pattern:
+                skipped.append((match, "not found or not a regular file"))
+    return files, skipped
+
+
+def _sniff(full_path):
+    """Return (size, first bytes, reason it cannot be shown or None)."""
+    with open(full_path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        head = file.read(SNIFF_BYTES)
+    if b"\0" in head:
+        return size, head, "binary"
+    try:
+        _decode_window(head)
+    except UnicodeDecodeError:
+        return size, head, "not UTF-8 text"
+    return size, head, None
+
+
+def _allocate(sizes, budget):
+    """Split budget so files smaller than an even share get all they need and the rest split the remainder."""
+    shares = {}
+    remaining = budget
+    ordered = sorted(sizes.items(), key=lambda item: item[1])
+    for count, (path, size) in zip(range(len(ordered), 0, -1), ordered):
+        shares[path] = min(size, remaining // count)
+        remaining -= shares[path]
+    return shares
+
+
+def _read(full_path, head, share):
+    if share <= len(head):
+        return head[:share]
+    with open(full_path, "rb") as file:
+        file.seek(len(head))
+        return head + file.read(share - len(head))
+
+
+def read_files(working_directory, paths, max_bytes=MAX_TOTAL_BYTES) -> str:
+    try:
+        root = os.path.abspath(working_directory)
+        if isinstance(paths, str):
+            paths = [paths]
+        if not paths:
+            return "Error: No paths given"
+        budget = min(max(int(max_bytes or MAX_TOTAL_BYTES), 1), MAX_TOTAL_BYTES)
+
+        files, skipped = _expand(root, paths)
+        if len(files) > MAX_FILES:
+            skipped.append((f"{len(files) - MAX_FILES} more files", f"over the {MAX_FILES}-file limit; narrow the paths"))
+            files = files[:MAX_FILES]
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            sniffed = dict(zip(files, executor.map(lambda path: _sniff(os.path.join(root, path)), files)))
+            readable = [path for path in files if sniffed[path][2] is None]
+            skipped += [(path, sniffed[path][2]) for path in files if sniffed[path][2] is not None]
+            shares = _allocate({path: sniffed[path][0] for path in readable}, budget)
+            contents = executor.map(lambda path: _read(os.path.join(root, path), sniffed[path][1], shares[path]), readable)
+
+            sections = []
+            bytes_read = sum(len(sniffed[path][1]) for path in files)
+            for path, data in zip(readable, contents):
+                size, head, _ = sniffed[path]
+                bytes_read += max(len(data) - len(head), 0)
+                try:
+                    text, decoded = _decode_window(data)
+                except UnicodeDecodeError:
+                    skipped.append((path, "not UTF-8 text"))
+                    continue
+                section = f"==> {path} <==\n{text}"
+                if decoded < size:
+                    section += f'\n[...truncated at {decoded} of {size} bytes; continue with get_file_content("{path}", offset={decoded}, unit="bytes")]'
+                sections.append(section)
+
+        # Recorded here because the pool threads do not see the caller's trace span.
+        tracer.record(bytes_read=bytes_read)
+        if skipped:
+            sections.append("Skipped: " + ", ".join(f"{path} ({reason})" for path, reason in skipped))
+        return "\n\n".join(sections)
+    except Exception as e:
+        return f"Error: {e}"
@@ -1,6 +1,14 @@
 from pathlib import Path
-import subprocess
 from google.genai import types
+from functions.config import tool_timeout
+from functions.python_pool import PythonPool
+from functions.output_capture import MAX_OUTPUT_BYTES, run_captured
+from functions.tracing import tracer
+
+TIMEOUT = 30
+_pool = None
+_max_output_bytes = MAX_OUTPUT_BYTES
+_echo_output = False
 
 schema_run_python_file = types.FunctionDeclaration(
     name="run_python_file",
@@ -24,6 +32,19 @@ schema_run_python_file = types.FunctionDeclaration(
 )
 
 
+def enable_worker_pool(size, max_runs):
+    """Run Python files on a pool of pre-warmed workers instead of a fresh interpreter per call."""
+    global _pool
+    _pool = PythonPool(size=size, max_runs=max_runs)
+
+
+def configure_output(max_bytes, echo):
+    """Set the per-stream output cap and whether script output is echoed live to the console."""
+    global _max_output_bytes, _echo_output
+    _max_output_bytes = max_bytes
+    _echo_output = echo
+
+
 def run_python_file(working_directory, file_path, args=[]):
     if args is None:
         args = []
@@ -42,13 +63,21 @@ def run_python_file(working_directory, file_path, args=[]):
         if target_file.suffix != ".py":
             return f'Error: "{file_path}" is not a Python file.'
 
-        completed_process = subprocess.run(
-            ["python3", str(target_file)] + args,
-            cwd=str(working_dir),
-            capture_output=True,
-            text=True,
-            timeout=30,
-        )
+        cmd = ["python3", str(target_file)] + args
+        timeout = tool_timeout(TIMEOUT)
+        with tracer.span("python_process", category="subprocess", backend="pool" if _pool else "subprocess") as span:
+            if _pool:
+                completed_process = _pool.run(cmd, target_file, args, working_dir, timeout, _max_output_bytes)
+            else:
+                completed_process = run_captured(
+                    cmd,
+                    cwd=str(working_dir),
+                    timeout=timeout,
+                    max_bytes=_max_output_bytes,
+                    echo=_echo_output,
+                )
+            span["returncode"] = completed_process.returncode
+            span["output_chars"] = len(completed_process.stdout) + len(completed_process.stderr)
         if completed_process.returncode != 0:
             return f"Error: Python file execution failed with return code {completed_process.returncode}\nSTDERR: {completed_process.stderr}"
 
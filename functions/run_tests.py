@@ -0,0 +1,330 @@
+import ast
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from pathlib import Path
+from google.genai import types
+from functions.config import CACHE_DIR, tool_timeout
+from functions.get_files_info import _gitignore_rules, _is_ignored
+from functions.output_capture import run_captured
+from functions.tracing import tracer
+
+RUNNER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_runner.py")
+TIMEOUT = 120
+MAX_WORKERS = 4
+# Tests expected to take less than this per extra process run in fewer shards, since starting
+# an interpreter and importing the code under test costs more than it saves.
+MIN_SHARD_SECONDS = 1.0
+DEFAULT_TEST_SECONDS = 0.05
+MAX_LISTED_PASSES = 50
+UNITTEST_IMPORT = re.compile(r"^\s*(?:import|from)\s.*\bunittest\b", re.MULTILINE)
+
+schema_run_tests = types.FunctionDeclaration(
+    name="run_tests",
+    description="Discovers and runs unittest/pytest tests in the working directory in parallel, returning pass/fail and duration per test. Prefer this over run_python_file for test files, and use only_failed or only_affected when re-running after a fix.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "tests": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(type=types.Type.STRING),
+                description="Optional test ids, or id prefixes such as a module or class, to run instead of the whole suite.",
+            ),
+            "only_failed": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Re-run only the tests that failed or errored in the previous run.",
+            ),
+            "only_affected": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Run only tests whose test file or a local module it imports changed since that test last ran.",
+            ),
+            "pattern": types.Schema(
+                type=types.Type.STRING,
+                description='Test file name pattern. Defaults to "test*.py".',
+            ),
+            "framework": types.Schema(
+                type=types.Type.STRING,
+                enum=["auto", "unittest", "pytest"],
+                description='Test framework; "auto" (default) uses unittest for suites written only with unittest and pytest otherwise, if it is installed.',
+            ),
+        },
+    ),
+)
+
+
+def _python_files(root):
+    """Map relative path to (mtime_ns, size) for every .py file under root, honoring .gitignore."""
+    files = {}
+    stack = [(root, _gitignore_rules(root, root))]
+    prefix_length = len(os.path.join(root, ""))
+    while stack:
+        directory, rules = stack.pop()
+        try:
+            scanned = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in scanned:
+            relative_path = entry.path[prefix_length:].replace(os.sep, "/")
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if entry.name.startswith(".") or entry.name == "__pycache__" or _is_ignored(rules, relative_path, is_dir):
+                continue
+            if is_dir:
+                stack.append((entry.path, rules + _gitignore_rules(entry.path, root)))
+            elif entry.name.endswith(".py") and entry.is_file():
+                stat = entry.stat()
+                files[relative_path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def _local_imports(root, relative_path, modules):
+    """Return the local files imported by relative_path, resolving modules against the root."""
+    try:
+        tree = ast.parse(Path(root, relative_path).read_text(encoding="utf-8", errors="replace"))
+    except (OSError, SyntaxError, ValueError):
+        return set()
+    package = relative_path.rsplit("/", 1)[0].replace("/", ".") if "/" in relative_path else ""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                parts = package.split(".") if package else []
+                parts = parts[:len(parts) - node.level + 1]
+                base = ".".join(parts + ([base] if base else []))
+            names.add(base)
+            names.update(f"{base}.{alias.name}" if base else alias.name for alias in node.names)
+
+    imported = set()
+    for name in names:
+        # "a.b.c" also imports the packages "a" and "a.b".
+        parts = name.split(".")
+        for end in range(1, len(parts) + 1):
+            path = modules.get(".".join(parts[:end]))
+            if path:
+                imported.add(path)
+    return imported
+
+
+def _dependencies(root, files):
+    """Map each local .py file to the set of local files it imports directly or transitively."""
+    modules = {}
+    for relative_path in files:
+        name = relative_path[:-3].replace("/", ".")
+        modules[name.removesuffix(".__init__")] = relative_path
+    direct = {path: _local_imports(root, path, modules) for path in files}
+
+    closures = {}
+    for path in files:
+        seen = {path}
+        stack = [path]
+        while stack:
+            for dependency in direct.get(stack.pop(), ()):
+                if dependency not in seen:
+                    seen.add(dependency)
+                    stack.append(dependency)
+        closures[path] = seen
+    return closures
+
+
+def _signature(closure, files):
+    digest = hashlib.sha1()
+    for path in sorted(closure):
+        digest.update(f"{path}:{files.get(path)}\n".encode())
+    return digest.hexdigest()
+
+
+def _pick_framework(root, test_files, files):
+    """Resolve "auto" to unittest when every test file uses unittest and nothing configures pytest.
+
+    Starting pytest costs far more than unittest, so it is only used when the suite needs it;
+    test_runner.py falls back to unittest if pytest is not installed.
+    """
+    if any(path.rsplit("/", 1)[-1] == "conftest.py" for path in files) or (root / "pytest.ini").exists():
+        return "auto"
+    for path in test_files:
+        text = Path(root, path).read_text(encoding="utf-8", errors="replace")
+        if not UNITTEST_IMPORT.search(text):
+            return "auto"
+    return "unittest"
+
+
+def _state_path(root):
+    return os.path.join(CACHE_DIR, f"tests_{hashlib.sha1(str(root).encode()).hexdigest()[:16]}.json")
+
+
+def _load_state(root):
+    try:
+        with open(_state_path(root), encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {"tests": {}, "collected": None}
+
+
+def _save_state(root, state):
+    path = _state_path(root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(state, file)
+
+
+def _run_runner(root, job, timeout=TIMEOUT):
+    """Run test_runner.py on job in a fresh interpreter and return its parsed result."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        job_path = os.path.join(temp_dir, "job.json")
+        result_path = os.path.join(temp_dir, "result.json")
+        with open(job_path, "w", encoding="utf-8") as file:
+            json.dump(job, file)
+        with tracer.span("test_process", category="subprocess", mode=job["mode"], tests=len(job.get("tests", []))) as span:
+            completed_process = run_captured(
+                ["python3", RUNNER_SCRIPT, job_path, result_path],
+                cwd=str(root),
+                timeout=timeout,
+            )
+            span["returncode"] = completed_process.returncode
+        if not os.path.exists(result_path):
+            output = (completed_process.stderr or completed_process.stdout).strip()
+            return {"error": f"test process exited with code {completed_process.returncode}\n{output[-2000:]}"}
+        with open(result_path, encoding="utf-8") as file:
+            return json.load(file)
+
+
+def _shards(tests, history, workers):
+    """Split tests into balanced shards, longest expected duration first."""
+    def expected(test):
+        return history.get(test["id"], {}).get("duration", DEFAULT_TEST_SECONDS)
+
+    total = sum(expected(test) for test in tests)
+    count = max(1, min(workers, len(tests), math.ceil(total / MIN_SHARD_SECONDS)))
+    shards = [[] for _ in range(count)]
+    loads = [0.0] * count
+    for test in sorted(tests, key=expected, reverse=True):
+        index = loads.index(min(loads))
+        shards[index].append(test)
+        loads[index] += expected(test)
+    return shards
+
+
+def _select(tests, previous, tests_filter, only_failed, only_affected, files, closures):
+    selected = tests
+    if tests_filter:
+        selected = [
+            test for test in selected
+            if any(test["id"] == name or test["id"].startswith((name + ".", name + "::")) or test["file"] == name for name in tests_filter)
+        ]
+    if only_failed:
+        selected = [test for test in selected if previous.get(test["id"], {}).get("status") in ("failed", "error")]
+    if only_affected:
+        selected = [
+            test for test in selected
+            if previous.get(test["id"], {}).get("signature") != _signature(closures.get(test["file"], {test["file"]}), files)
+        ]
+    return selected
+
+
+def _format(results, framework, shard_count, elapsed, skipped_count):
+    counts = {"passed": 0, "failed": 0, "error": 0, "skipped": 0}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+
+    lines = [
+        f"Ran {len(results)} tests ({framework}) in {elapsed:.2f}s on {shard_count} process{'es' if shard_count != 1 else ''}: "
+        f"{counts['passed']} passed, {counts['failed']} failed, {counts['error']} errors, {counts['skipped']} skipped"
+        + (f"; {skipped_count} not selected" if skipped_count else "")
+    ]
+    problems = [result for result in results if result["status"] in ("failed", "error")]
+    for result in problems:
+        lines.append(f"{result['status'].upper()} {result['id']} ({result['duration']:.3f}s)")
+        lines.extend(f"    {line}" for line in result["message"].rstrip().splitlines())
+
+    passes = sorted((result for result in results if result["status"] in ("passed", "skipped")), key=lambda result: -result["duration"])
+    for result in passes[:MAX_LISTED_PASSES]:
+        lines.append(f"{result['status'].upper()} {result['id']} ({result['duration']:.3f}s)")
+    if len(passes) > MAX_LISTED_PASSES:
+        lines.append(f"... {len(passes) - MAX_LISTED_PASSES} more passed or skipped (fastest omitted)")
+    return "\n".join(lines)
+
+
+def run_tests(working_directory, tests=None, only_failed=False, only_affected=False, pattern="test*.py", framework="auto", workers=MAX_WORKERS):
+    try:
+        root = Path(working_directory).resolve()
+        if framework not in ("auto", "unittest", "pytest"):
+            return f'Error: Invalid framework "{framework}", expected "auto", "unittest" or "pytest"'
+        pattern = pattern or "test*.py"
+        started = time.perf_counter()
+
+        files = _python_files(str(root))
+        test_files = sorted(path for path in files if fnmatch(path.rsplit("/", 1)[-1], pattern))
+        if not test_files:
+            return f'No test files matching "{pattern}" found'
+
+        if framework == "auto":
+            framework = _pick_framework(root, test_files, files)
+
+        # Collection imports every test module, so reuse the last one while no .py file changed.
+        state = _load_state(root)
+        collected = state.get("collected")
+        snapshot = _signature(files, files) + framework + pattern
+        if not collected or collected.get("snapshot") != snapshot:
+            result = _run_runner(root, {"mode": "collect", "framework": framework, "files": test_files}, tool_timeout(TIMEOUT))
+            if "error" in result:
+                return f"Error: Could not collect tests: {result['error']}"
+            collected = {"snapshot": snapshot, "framework": result["framework"], "tests": result["tests"]}
+            state["collected"] = collected
+
+        previous = state["tests"]
+        closures = _dependencies(str(root), files) if only_affected else {}
+        broken = [test for test in collected["tests"] if "error" in test]
+        runnable = [test for test in collected["tests"] if "error" not in test]
+        selected = _select(runnable, previous, tests, only_failed, only_affected, files, closures)
+        broken = _select(broken, previous, tests, False, False, files, closures)
+        if not selected and not broken:
+            _save_state(root, state)
+            if only_failed:
+                return "No failing tests from the previous run to re-run"
+            if only_affected:
+                return "No tests are affected by changes since they last ran"
+            return "No tests matched the selection"
+
+        shards = _shards(selected, previous, max(int(workers or 1), 1)) if selected else []
+        results = [
+            {"id": test["id"], "file": test["file"], "status": "error", "duration": 0.0, "message": test["error"]}
+            for test in broken
+        ]
+        # Read in this thread: the shard threads do not see the caller's tool deadline.
+        timeout = tool_timeout(TIMEOUT)
+        with ThreadPoolExecutor(max_workers=max(len(shards), 1)) as executor:
+            jobs = [{"mode": "run", "framework": collected["framework"], "tests": shard} for shard in shards]
+            for shard, result in zip(shards, executor.map(lambda job: _run_runner(root, job, timeout), jobs)):
+                if "error" in result:
+                    results.extend(
+                        {"id": test["id"], "file": test["file"], "status": "error", "duration": 0.0, "message": result["error"]}
+                        for test in shard
+                    )
+                    continue
+                results.extend(result["tests"])
+
+        if not closures:
+            closures = _dependencies(str(root), files)
+        for result in results:
+            closure = closures.get(result["file"], {result["file"]})
+            previous[result["id"]] = {
+                "status": result["status"],
+                "duration": result["duration"],
+                "signature": _signature(closure, files),
+            }
+        _save_state(root, state)
+
+        order = {test["id"]: index for index, test in enumerate(collected["tests"])}
+        results.sort(key=lambda result: order.get(result["id"], len(order)))
+        skipped_count = len(collected["tests"]) - len(results)
+        return _format(results, collected["framework"], len(shards), time.perf_counter() - started, skipped_count)
+    except Exception as e:
+        return f"Error: running tests: {e}"
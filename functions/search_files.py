@@ -0,0 +1,121 @@
+import mmap
+import os
+import re
+from google.genai import types
+
+from functions.file_index import MAX_INDEXED_BYTES, get_index, required_literals
+from functions.tracing import tracer
+
+MAX_RESULTS = 50
+MAX_LINE_CHARS = 200
+
+schema_search_files = types.FunctionDeclaration(
+    name="search_files",
+    description="Search the contents of files for a literal string or regular expression, constrained to the working directory. Returns matching lines as path:line: text.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "pattern": types.Schema(
+                type=types.Type.STRING,
+                description="The text or regular expression to search for.",
+            ),
+            "regex": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Whether pattern is a regular expression. Defaults to false (literal search).",
+            ),
+            "ignore_case": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Whether to match case-insensitively. Defaults to false.",
+            ),
+            "directory": types.Schema(
+                type=types.Type.STRING,
+                description="Optional directory to search in, relative to the working directory.",
+            ),
+            "context": types.Schema(
+                type=types.Type.INTEGER,
+                description="Optional number of lines of context to show around each match.",
+            ),
+            "max_results": types.Schema(
+                type=types.Type.INTEGER,
+                description=f"Optional maximum number of matches to return (default and cap {MAX_RESULTS}).",
+            ),
+        },
+        required=["pattern"],
+    ),
+)
+
+
+def _shorten(line):
+    line = line.rstrip("\n")
+    return line if len(line) <= MAX_LINE_CHARS else line[:MAX_LINE_CHARS] + "..."
+
+
+def _contains_all(path, literals):
+    """Check with mmap whether a large unindexed file contains every literal before reading lines."""
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return all(mapped.find(literal.encode()) != -1 for literal in literals)
+
+
+def search_files(working_directory, pattern, regex=False, ignore_case=False, directory=None, context=0, max_results=MAX_RESULTS) -> str:
+    try:
+        working_dir_abs_path = os.path.abspath(working_directory)
+        target_dir = os.path.normpath(os.path.join(working_dir_abs_path, directory or "."))
+        if target_dir != working_dir_abs_path and not target_dir.startswith(working_dir_abs_path + os.sep):
+            return f'Error: Cannot search "{directory}" as it is outside the permitted working directory'
+        if not pattern:
+            return "Error: Search pattern cannot be empty"
+
+        try:
+            compiled = re.compile(pattern if regex else re.escape(pattern), re.IGNORECASE if ignore_case else 0)
+        except re.error as e:
+            return f'Error: Invalid regular expression "{pattern}": {e}'
+
+        max_results = min(max(int(max_results or MAX_RESULTS), 1), MAX_RESULTS)
+        context = max(int(context or 0), 0)
+        prefix = os.path.relpath(target_dir, working_dir_abs_path).replace(os.sep, "/")
+        prefix = "" if prefix == "." else prefix + "/"
+
+        index = get_index(working_dir_abs_path)
+        with tracer.span("search_index_refresh", category="io") as span:
+            span["files_reindexed"] = index.refresh()
+        literals = required_literals(pattern) if regex else [pattern]
+
+        results = []
+        matches = 0
+        for relative_path in index.candidates(literals):
+            if not relative_path.startswith(prefix):
+                continue
+            full_path = os.path.join(working_dir_abs_path, relative_path)
+            try:
+                if literals and not compiled.flags & re.IGNORECASE and os.path.getsize(full_path) > MAX_INDEXED_BYTES:
+                    if not _contains_all(full_path, literals):
+                        continue
+                with open(full_path, encoding="utf-8") as file:
+                    lines = file.readlines()
+            except (OSError, UnicodeDecodeError):
+                continue
+            tracer.record(files_scanned=1)
+
+            for number, line in enumerate(lines):
+                if not compiled.search(line):
+                    continue
+                matches += 1
+                if matches > max_results:
+                    results.append("[...more matches; narrow the pattern or directory to see them]")
+                    return "\n".join(results)
+                if context:
+                    start = max(number - context, 0)
+                    block = [
+                        f"{relative_path}:{i + 1}{':' if i == number else '-'} {_shorten(lines[i])}"
+                        for i in range(start, min(number + context + 1, len(lines)))
+                    ]
+                    results.append("\n".join(block) + "\n--")
+                else:
+                    results.append(f"{relative_path}:{number + 1}: {_shorten(line)}")
+
+        return "\n".join(results) if results else f'No matches found for "{pattern}"'
+    except Exception as e:
+        return f"Error: {e}"
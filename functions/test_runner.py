@@ -0,0 +1,198 @@
+"""Test collector and runner executed in a subprocess for functions.run_tests.
+
+Started as `python3 test_runner.py <job file> <result file>` with the working directory as cwd.
+The job is a JSON object {"mode": "collect" | "run", "framework": "auto" | "unittest" | "pytest",
+"files": [...], "tests": [...]}. The result file receives {"framework": ..., "tests": [...]} where
+each test has an id and its file, plus status, duration and message after a run.
+"""
+import json
+import os
+import sys
+import time
+import traceback
+import unittest
+
+MAX_MESSAGE_CHARS = 2000
+
+
+def module_name(relative_path):
+    return relative_path[:-3].replace("/", ".").removesuffix(".__init__")
+
+
+def pick_framework(framework):
+    if framework != "auto":
+        return framework
+    try:
+        import pytest  # noqa: F401
+    except ImportError:
+        return "unittest"
+    return "pytest"
+
+
+def iterate_suite(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from iterate_suite(test)
+        else:
+            yield test
+
+
+def unittest_collect(files):
+    loader = unittest.TestLoader()
+    tests = []
+    for relative_path in files:
+        for test in iterate_suite(loader.loadTestsFromName(module_name(relative_path))):
+            if isinstance(test, unittest.loader._FailedTest):
+                message = "".join(traceback.format_exception(test._exception))
+                tests.append({"id": test.id(), "file": relative_path, "error": message[-MAX_MESSAGE_CHARS:]})
+            else:
+                tests.append({"id": test.id(), "file": relative_path})
+    return tests
+
+
+class RecordingResult(unittest.TestResult):
+    """Keeps status, duration and failure message for every test it sees."""
+
+    def __init__(self, files):
+        super().__init__()
+        self.files = files
+        self.records = {}
+        self.started = {}
+
+    def record(self, test, status, message=""):
+        duration = time.perf_counter() - self.started.get(test.id(), time.perf_counter())
+        self.records[test.id()] = {
+            "id": test.id(),
+            "file": self.files.get(test.id()),
+            "status": status,
+            "duration": round(duration, 4),
+            "message": message[-MAX_MESSAGE_CHARS:],
+        }
+
+    def startTest(self, test):
+        super().startTest(test)
+        self.started[test.id()] = time.perf_counter()
+
+    def addSuccess(self, test):
+        # Some Python versions still report success after a subtest failed.
+        if self.records.get(test.id(), {}).get("status") not in ("failed", "error"):
+            self.record(test, "passed")
+
+    def addFailure(self, test, err):
+        self.record(test, "failed", self._exc_info_to_string(err, test))
+
+    def addError(self, test, err):
+        self.record(test, "error", self._exc_info_to_string(err, test))
+
+    def addSubTest(self, test, subtest, err):
+        """Record a failing subtest against its parent test, keeping every subtest's message."""
+        if err is None:
+            return
+        status = "failed" if issubclass(err[0], test.failureException) else "error"
+        previous = self.records.get(test.id())
+        message = f"{subtest.id()}\n{self._exc_info_to_string(err, test)}"
+        if previous is not None:
+            status = "error" if "error" in (status, previous["status"]) else status
+            message = previous["message"] + "\n" + message
+        self.record(test, status, message)
+
+    def addSkip(self, test, reason):
+        self.record(test, "skipped", reason)
+
+    def addExpectedFailure(self, test, err):
+        self.record(test, "passed")
+
+    def addUnexpectedSuccess(self, test):
+        self.record(test, "failed", "unexpected success")
+
+
+def unittest_run(tests):
+    files = {test["id"]: test["file"] for test in tests}
+    suite = unittest.TestLoader().loadTestsFromNames([test["id"] for test in tests])
+    result = RecordingResult(files)
+    suite.run(result)
+    return list(result.records.values())
+
+
+def pytest_main(args, plugin):
+    import pytest
+
+    # pytest prints its own report; keep it out of the result and the caller's output.
+    with open(os.devnull, "w") as devnull:
+        saved = sys.stdout
+        sys.stdout = devnull
+        try:
+            pytest.main(["-q", "-p", "no:cacheprovider", "--rootdir", ".", *args], plugins=[plugin])
+        finally:
+            sys.stdout = saved
+
+
+def pytest_collect(files):
+    class Collector:
+        def __init__(self):
+            self.tests = []
+
+        def pytest_collection_modifyitems(self, items):
+            for item in items:
+                self.tests.append({"id": item.nodeid, "file": item.nodeid.split("::", 1)[0]})
+
+        def pytest_collectreport(self, report):
+            if report.failed:
+                message = str(report.longrepr)[-MAX_MESSAGE_CHARS:]
+                self.tests.append({"id": report.nodeid, "file": report.nodeid.split("::", 1)[0], "error": message})
+
+    collector = Collector()
+    pytest_main(["--collect-only", *files], collector)
+    return collector.tests
+
+
+def pytest_run(tests):
+    files = {test["id"]: test["file"] for test in tests}
+
+    class Recorder:
+        def __init__(self):
+            self.records = {}
+
+        def pytest_runtest_logreport(self, report):
+            record = self.records.setdefault(report.nodeid, {
+                "id": report.nodeid,
+                "file": files.get(report.nodeid),
+                "status": "passed",
+                "duration": 0.0,
+                "message": "",
+            })
+            record["duration"] = round(record["duration"] + report.duration, 4)
+            if report.skipped and record["status"] == "passed":
+                record["status"] = "skipped"
+                record["message"] = str(report.longrepr[-1]) if isinstance(report.longrepr, tuple) else ""
+            elif report.failed:
+                record["status"] = "failed" if report.when == "call" else "error"
+                record["message"] = str(report.longrepr)[-MAX_MESSAGE_CHARS:]
+
+    recorder = Recorder()
+    pytest_main([test["id"] for test in tests], recorder)
+    return list(recorder.records.values())
+
+
+def main():
+    with open(sys.argv[1], encoding="utf-8") as file:
+        job = json.load(file)
+    sys.path.insert(0, os.getcwd())
+    framework = pick_framework(job["framework"])
+
+    try:
+        if job["mode"] == "collect":
+            collect = pytest_collect if framework == "pytest" else unittest_collect
+            result = {"framework": framework, "tests": collect(job["files"])}
+        else:
+            run = pytest_run if framework == "pytest" else unittest_run
+            result = {"framework": framework, "tests": run(job["tests"])}
+    except Exception:
+        result = {"framework": framework, "error": traceback.format_exc()[-MAX_MESSAGE_CHARS:]}
+
+    with open(sys.argv[2], "w", encoding="utf-8") as file:
+        json.dump(result, file)
+
+
+if __name__ == "__main__":
+    main()
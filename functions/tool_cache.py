@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from functions.dispatch import PATH_ARGS, READ_ONLY_FUNCTIONS, written_paths
+from functions.tracing import tracer
+
+# Directory listings are not cached: a directory's own stat does not change when a file
+# in it grows or when anything below it changes, so a listing key cannot see it go stale.
+CACHEABLE_FUNCTIONS = {"get_file_content"}
+# Arguments left at these values are dropped from keys, so a call that spells out a default
+# shares its entry with one that leaves it out, e.g. a prefetch of the whole file.
+DEFAULT_ARGS = {"get_file_content": {"offset": 0, "unit": "lines"}}
+MAX_ENTRIES = 256
+MAX_DISK_ENTRIES = 4096
+
+
+class ToolCache:
+    """LRU cache of read-only tool results keyed by tool name, normalized args and target mtime/size.
+
+    Entries are optionally backed by a SQLite file so they survive across runs. Since keys
+    include the stat of the target file, a changed file never produces a stale hit; writes
+    made through write_file also drop the entries for the path.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, path=None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # Called with the key of every hit; the prefetcher uses it to count its hits.
+        self.on_hit = None
+        self.db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, function_name TEXT, path TEXT, result TEXT, last_used REAL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS entries_path ON entries (path)")
+            self.db.commit()
+
+    def key(self, working_directory, function_name, args):
+        """Return (key, target path) for a call, or (None, None) if the target cannot be stat'ed."""
+        working_dir = os.path.abspath(working_directory)
+        target = os.path.normpath(os.path.join(working_dir, args.get(PATH_ARGS[function_name]) or "."))
+        try:
+            stat = os.stat(target)
+        except OSError:
+            return None, None
+
+        defaults = DEFAULT_ARGS.get(function_name, {})
+        normalized_args = {}
+        for name, value in args.items():
+            # Numbers decoded from model JSON may arrive as 10.0 where another call says 10.
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            if value is not None and (name not in defaults or value != defaults[name]):
+                normalized_args[name] = value
+        normalized_args[PATH_ARGS[function_name]] = os.path.relpath(target, working_dir)
+        payload = json.dumps(
+            [function_name, working_dir, normalized_args, stat.st_mtime_ns, stat.st_size],
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest(), target
+
+    def contains(self, key):
+        """Return whether key is cached in memory, without counting a hit or miss."""
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][2]
+
+            if self.db:
+                row = self.db.execute(
+                    "SELECT function_name, path, result FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    self.db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self.db.commit()
+                    self._remember(key, row)
+                    self.hits += 1
+                    return row[2]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, function_name, path, result):
+        with self.lock:
+            self._remember(key, (function_name, path, result))
+            if self.db:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                    (key, function_name, path, result, time.time()),
+                )
+                self.db.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    "SELECT key FROM entries ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (MAX_DISK_ENTRIES,),
+                )
+                self.db.commit()
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, working_directory, file_path):
+        """Drop the entries for a written path."""
+        path = os.path.normpath(os.path.join(os.path.abspath(working_directory), file_path))
+        with self.lock:
+            for key, (_, entry_path, _) in list(self.entries.items()):
+                if entry_path == path:
+                    del self.entries[key]
+            if self.db:
+                self.db.execute("DELETE FROM entries WHERE path = ?", (path,))
+                self.db.commit()
+
+    def wrap(self, function_name, function):
+        """Return function with caching for read-only tools and invalidation for the rest."""
+
+        def cached(working_directory, **args):
+            if function_name not in CACHEABLE_FUNCTIONS and function_name in READ_ONLY_FUNCTIONS:
+                return function(working_directory, **args)
+            if function_name in CACHEABLE_FUNCTIONS:
+                key, path = self.key(working_directory, function_name, args)
+                if key is None:
+                    return function(working_directory, **args)
+                result = self.get(key)
+                tracer.record(cache_hits=int(result is not None), cache_misses=int(result is None))
+                if result is not None and self.on_hit:
+                    self.on_hit(key)
+                if result is None:
+                    result = function(working_directory, **args)
+                    if isinstance(result, str) and not result.startswith("Error"):
+                        self.put(key, function_name, path, result)
+                return result
+
+            result = function(working_directory, **args)
+            if function_name == "write_file":
+                for path in written_paths(args):
+                    self.invalidate(working_directory, path)
+            return result
+
+        return cached
+
+    def wrap_all(self, function_map):
+        return {name: self.wrap(name, function) for name, function in function_map.items()}
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = f"{self.hits / total:.0%}" if total else "n/a"
+        return f"Tool cache: {self.hits} hits, {self.misses} misses (hit rate {rate})"
@@ -0,0 +1,112 @@
+import contextvars
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+# Numeric span attributes that are labels rather than quantities, so summing them is meaningless.
+NOT_SUMMED = {"iteration", "returncode", "first_chunk_ms"}
+
+
+class Tracer:
+    """Records timed spans for model calls, tool dispatches and tool I/O.
+
+    Disabled by default so instrumented code costs one attribute check. Spans can be exported
+    as JSON lines or in Chrome trace format (chrome://tracing, Perfetto) and summarized as a
+    table per span name.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.ids = itertools.count()
+
+    @contextmanager
+    def span(self, name, category="agent", **attrs):
+        """Time the enclosed block; yields the span's attrs so callers can add to them."""
+        if not self.enabled:
+            yield attrs
+            return
+
+        parent = _current_span.get()
+        span_id = next(self.ids)
+        token = _current_span.set((span_id, attrs))
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            duration = time.perf_counter() - start
+            _current_span.reset(token)
+            span = {
+                "id": span_id,
+                "parent": parent[0] if parent else None,
+                "name": name,
+                "category": category,
+                "start_ms": round((start - self.origin) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+                "thread": threading.get_ident(),
+                "attrs": attrs,
+            }
+            with self.lock:
+                self.spans.append(span)
+
+    def record(self, **counters):
+        """Add numeric counters (bytes_read, cache_hits, ...) to the innermost open span."""
+        if not self.enabled:
+            return
+        current = _current_span.get()
+        if current is not None:
+            _, attrs = current
+            for key, value in counters.items():
+                attrs[key] = attrs.get(key, 0) + value
+
+    def export(self, path):
+        """Write spans as JSON lines if path ends in .jsonl, otherwise as a Chrome trace."""
+        with open(path, "w", encoding="utf-8") as file:
+            if path.endswith(".jsonl"):
+                for span in self.spans:
+                    file.write(json.dumps(span, default=str) + "\n")
+                return
+            events = [
+                {
+                    "name": span["name"],
+                    "cat": span["category"],
+                    "ph": "X",
+                    "ts": span["start_ms"] * 1000,
+                    "dur": span["duration_ms"] * 1000,
+                    "pid": 1,
+                    "tid": span["thread"],
+                    "args": span["attrs"],
+                }
+                for span in self.spans
+            ]
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, default=str)
+
+    def summary(self):
+        """Return a per-span-name table of counts, durations and summed numeric attributes."""
+        rows = {}
+        for span in self.spans:
+            row = rows.setdefault(span["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "counters": {}})
+            row["count"] += 1
+            row["total_ms"] += span["duration_ms"]
+            row["max_ms"] = max(row["max_ms"], span["duration_ms"])
+            for key, value in span["attrs"].items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and key not in NOT_SUMMED:
+                    row["counters"][key] = row["counters"].get(key, 0) + value
+
+        lines = [f"{'span':<28} {'count':>6} {'total ms':>10} {'mean ms':>9} {'max ms':>9}  counters"]
+        for name, row in sorted(rows.items(), key=lambda item: -item[1]["total_ms"]):
+            counters = ", ".join(f"{key}={value}" for key, value in sorted(row["counters"].items()))
+            lines.append(
+                f"{name:<28} {row['count']:>6} {row['total_ms']:>10.1f} "
+                f"{row['total_ms'] / row['count']:>9.1f} {row['max_ms']:>9.1f}  {counters}"
+            )
+        return "\n".join(lines)
+
+
+tracer = Tracer()
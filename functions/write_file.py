@@ -1,9 +1,14 @@
 from pathlib import Path
+import os
+import re
+import tempfile
 from google.genai import types
+from functions.file_index import notify_write
+from functions.tracing import tracer
 
 schema_write_file = types.FunctionDeclaration(
     name="write_file",
-    description="Write or overwrite target file, constrained to the working directory.",
+    description="Write, overwrite or edit target files, constrained to the working directory. Prefer mode \"edit\" for small changes to existing files instead of resending the whole content.",
     parameters=types.Schema(
         type=types.Type.OBJECT,
         properties={
@@ -13,24 +18,212 @@ schema_write_file = types.FunctionDeclaration(
             ),
             "content": types.Schema(
                 type=types.Type.STRING,
-                description="The content to write to the file.",
+                description="The content to write to the file (mode \"overwrite\").",
+            ),
+            "mode": types.Schema(
+                type=types.Type.STRING,
+                enum=["overwrite", "edit"],
+                description='"overwrite" (default) replaces the file with content; "edit" applies edits or diff to the existing file.',
+            ),
+            "edits": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(
+                    type=types.Type.OBJECT,
+                    properties={
+                        "search": types.Schema(
+                            type=types.Type.STRING,
+                            description="Exact text to find; it must occur exactly once in the file.",
+                        ),
+                        "replace": types.Schema(
+                            type=types.Type.STRING,
+                            description="Text to put in its place.",
+                        ),
+                    },
+                ),
+                description="Search/replace edits applied in order (mode \"edit\").",
+            ),
+            "diff": types.Schema(
+                type=types.Type.STRING,
+                description="A unified diff with @@ hunks to apply to the file (mode \"edit\").",
+            ),
+            "files": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(
+                    type=types.Type.OBJECT,
+                    properties={
+                        "file_path": types.Schema(type=types.Type.STRING),
+                        "content": types.Schema(type=types.Type.STRING),
+                    },
+                ),
+                description="Optional list of {file_path, content} pairs to write in one call instead of file_path/content.",
             ),
         },
     ),
 )
 
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+\d+(?:,(\d+))? @@")
+
+# mkstemp creates files as 0600; new files get the mode open() would have given them.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def _atomic_write(target_file, content):
+    """Write content through a temp file and rename; returns False if the file was already identical."""
+    if target_file.is_file() and target_file.stat().st_size == len(content.encode()):
+        with target_file.open(encoding="utf-8", errors="replace", newline="") as file:
+            if file.read() == content:
+                return False
+
+    target_file.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=target_file.parent, prefix=f".{target_file.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        if target_file.exists():
+            os.chmod(temp_path, target_file.stat().st_mode & 0o7777)
+        else:
+            os.chmod(temp_path, 0o666 & ~UMASK)
+        os.replace(temp_path, target_file)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    tracer.record(bytes_written=len(content.encode()))
+    return True
+
 
-def write_file(working_directory: str, file_path: str, content: str) -> str:
+def _apply_edits(text, edits):
+    for number, edit in enumerate(edits, start=1):
+        search = edit.get("search") or ""
+        count = text.count(search) if search else 0
+        if count != 1:
+            raise ValueError(f"edit {number}: search text found {count} times, expected exactly once")
+        text = text.replace(search, edit.get("replace") or "", 1)
+    return text
+
+
+def _is_file_header(diff_lines, number, remaining):
+    """Whether diff_lines[number] opens a "--- a/x" / "+++ b/x" file header rather than hunk body."""
+    following = diff_lines[number + 1:number + 3]
+    if not diff_lines[number].startswith("--- ") or not following or not following[0].startswith("+++ "):
+        return False
+    # Inside a hunk the same pair could be a removed and an added line; the hunk's counts
+    # or an @@ header right after the pair tell them apart.
+    return max(remaining) <= 0 or len(following) == 2 and HUNK_HEADER.match(following[1]) is not None
+
+
+def _apply_diff(text, diff):
+    lines = text.splitlines(keepends=True)
+    diff_lines = diff.splitlines()
+    # Editors and models often leave blank lines after the last hunk; they are not context.
+    while diff_lines and not diff_lines[-1]:
+        diff_lines.pop()
+    hunks = []
+    remaining = (0, 0)
+    for number, line in enumerate(diff_lines):
+        header = HUNK_HEADER.match(line)
+        if header:
+            hunks.append((int(header.group(1)), [], []))
+            remaining = (int(header.group(2) or 1), int(header.group(3) or 1))
+        elif _is_file_header(diff_lines, number, remaining):
+            if hunks:
+                raise ValueError("diff touches more than one file; send one diff per file")
+        elif hunks and line[:1] in (" ", "-", "+", ""):
+            old_left, new_left = remaining
+            remaining = (old_left - (line[:1] != "+"), new_left - (line[:1] != "-"))
+            _, old, new = hunks[-1]
+            body = line[1:] + "\n"
+            if line[:1] in (" ", "", "-"):
+                old.append(body)
+            if line[:1] in (" ", "", "+"):
+                new.append(body)
+    if not hunks:
+        raise ValueError("diff contains no @@ hunks")
+
+    offset = 0
+    for number, (start, old, new) in enumerate(hunks, start=1):
+        stripped = [line.rstrip("\r\n") for line in lines]
+        wanted = [line.rstrip("\r\n") for line in old]
+        expected = max(start - 1 + offset, 0)
+        positions = [
+            position
+            for position in range(len(lines) - len(old) + 1)
+            if stripped[position:position + len(old)] == wanted
+        ]
+        if not positions:
+            raise ValueError(f"hunk {number}: context not found in file")
+        position = min(positions, key=lambda position: abs(position - expected))
+        if position + len(old) == len(lines) and lines and not lines[-1].endswith("\n") and new:
+            new[-1] = new[-1].rstrip("\n")
+        lines[position:position + len(old)] = new
+        offset += len(new) - len(old)
+    return "".join(lines)
+
+
+def _resolve(working_dir, file_path):
+    target_file = Path(working_dir, file_path).resolve()
+    target_file.relative_to(working_dir)
+    return target_file
+
+
+def write_file(working_directory: str, file_path: str = None, content: str = None, mode: str = "overwrite", edits=None, diff=None, files=None) -> str:
     try:
         working_dir = Path(working_directory).resolve()
-        target_file = Path(working_dir, file_path).resolve()
+        if files:
+            targets = []
+            for index, entry in enumerate(files):
+                if not isinstance(entry, dict) or not entry.get("file_path"):
+                    return f"Error: files[{index}] is missing file_path"
+                try:
+                    targets.append((entry["file_path"], _resolve(working_dir, entry["file_path"]), entry.get("content") or ""))
+                except ValueError:
+                    return f'Error: Cannot write to "{entry["file_path"]}" as it is outside the permitted working directory'
 
+            results = []
+            for path, target_file, file_content in targets:
+                if _atomic_write(target_file, file_content):
+                    notify_write(working_dir, target_file)
+                    results.append(f'Successfully wrote to "{path}" ({len(file_content)} characters written)')
+                else:
+                    results.append(f'No changes to "{path}" (content is identical)')
+            return "\n".join(results)
+
+        if not file_path:
+            return "Error: file_path or files is required"
         try:
-            target_file.relative_to(working_dir)
+            target_file = _resolve(working_dir, file_path)
         except ValueError:
             return f'Error: Cannot write to "{file_path}" as it is outside the permitted working directory'
-        target_file.write_text(content)
 
+        if mode == "edit":
+            if not target_file.is_file():
+                return f'Error: Cannot edit "{file_path}" as it does not exist'
+            if not edits and not diff:
+                return 'Error: mode "edit" requires edits or diff'
+            with target_file.open(encoding="utf-8", newline="") as file:
+                original = file.read()
+            # Edits and diffs are written with "\n"; a CRLF file keeps its line endings.
+            newline = "\r\n" if "\r\n" in original else "\n"
+            try:
+                original = original.replace("\r\n", "\n")
+                content = _apply_diff(original, diff) if diff else _apply_edits(original, edits)
+            except ValueError as e:
+                return f'Error: Cannot edit "{file_path}": {e}'
+            if newline == "\r\n":
+                content = content.replace("\r\n", "\n").replace("\n", "\r\n")
+        elif mode != "overwrite":
+            return f'Error: Invalid mode "{mode}", expected "overwrite" or "edit"'
+        elif content is None:
+            return "Error: content is required when overwriting a file"
+
+        if not _atomic_write(target_file, content):
+            return f'No changes to "{file_path}" (content is identical)'
+        notify_write(working_dir, target_file)
+
+        if mode == "edit":
+            return f'Successfully edited "{file_path}" ({len(content)} characters written)'
         return (
             f'Successfully wrote to "{file_path}" ({len(content)} characters written)'
         )
@@ -0,0 +1,136 @@
+import json
+import os
+
+from functions.dispatch import glob_base, written_paths
+
+DEFAULT_TOKEN_BUDGET = 30000
+KEEP_RECENT_TURNS = 2
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(content):
+    """Roughly estimate the prompt tokens of one Content from its serialized size."""
+    chars = 0
+    for part in content.parts or []:
+        if part.text:
+            chars += len(part.text)
+        if part.function_call:
+            chars += len(json.dumps(part.function_call.args or {}, default=str))
+        if part.function_response:
+            chars += len(json.dumps(part.function_response.response or {}, default=str))
+    return chars // CHARS_PER_TOKEN + 1
+
+
+def normalize_path(path):
+    return os.path.normpath(path or ".")
+
+
+class HistoryManager:
+    """Replaces stale tool outputs in the conversation with short stubs to bound prompt size.
+
+    A tool output is stale when a later call supersedes it: a file read followed by a write
+    or an identical read of the same file, or a directory listing followed by a newer listing of
+    that directory or a write inside it. If the history still exceeds the token budget, the
+    largest tool outputs outside the most recent turns are stubbed as well.
+    """
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, keep_recent_turns=KEEP_RECENT_TURNS):
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.compacted = 0
+        self.tokens_saved = 0
+
+    def tool_calls(self, messages):
+        """Pair each tool response with the function call that produced it.
+
+        Returns (message index, turn number, function name, args) tuples in history order.
+        """
+        calls = []
+        pending = []
+        turn = 0
+        for index, content in enumerate(messages):
+            if content.role == "model":
+                turn += 1
+                pending = [
+                    (part.function_call.name, dict(part.function_call.args or {}))
+                    for part in content.parts or []
+                    if part.function_call
+                ]
+            elif content.role == "tool" and pending:
+                name, args = pending.pop(0)
+                calls.append((index, turn, name, args))
+        return calls
+
+    def is_superseded(self, call, later_calls):
+        _, _, name, args = call
+        if name == "get_file_content":
+            path = normalize_path(args.get("file_path"))
+            for _, _, later_name, later_args in later_calls:
+                if later_name == "write_file" and path in map(normalize_path, written_paths(later_args)):
+                    return True
+                if later_name == "get_file_content" and {**later_args, "file_path": path} == {**args, "file_path": path}:
+                    return True
+        if name == "get_files_info":
+            directory = normalize_path(args.get("directory"))
+            for _, _, later_name, later_args in later_calls:
+                if later_name == "get_files_info" and normalize_path(later_args.get("directory")) == directory:
+                    return True
+                if later_name == "write_file":
+                    for written in map(normalize_path, written_paths(later_args)):
+                        if directory == "." or written.startswith(directory + os.sep):
+                            return True
+        if name == "read_files":
+            paths = args.get("paths") or []
+            bases = {normalize_path(glob_base(path)) for path in ([paths] if isinstance(paths, str) else paths)}
+            for _, _, later_name, later_args in later_calls:
+                if later_name == "read_files" and later_args == args:
+                    return True
+                if later_name == "write_file":
+                    for written in map(normalize_path, written_paths(later_args)):
+                        if any(base in (".", written) or written.startswith(base + os.sep) for base in bases):
+                            return True
+        return False
+
+    def stub(self, messages, index, name, args, reason):
+        content = messages[index]
+        response = content.parts[0].function_response.response or {}
+        if response.get("compacted"):
+            return
+
+        before = estimate_tokens(content)
+        described_args = ", ".join(f"{key}={value!r}" for key, value in args.items() if key != "content")
+        summary = f"[{name}({described_args}) output removed: {reason}. Call it again if needed.]"
+        from google.genai import types
+
+        messages[index] = types.Content(
+            role="tool",
+            parts=[types.Part.from_function_response(name=name, response={"result": summary, "compacted": True})],
+        )
+        self.compacted += 1
+        self.tokens_saved += max(before - estimate_tokens(messages[index]), 0)
+
+    def compact(self, messages):
+        """Compact messages in place and return the estimated prompt tokens afterwards."""
+        calls = self.tool_calls(messages)
+        for position, call in enumerate(calls):
+            if self.is_superseded(call, calls[position + 1:]):
+                index, _, name, args = call
+                self.stub(messages, index, name, args, "superseded by a later call")
+
+        total = sum(estimate_tokens(content) for content in messages)
+        if total <= self.token_budget or not calls:
+            return total
+
+        last_turn = calls[-1][1]
+        candidates = [call for call in calls if call[1] <= last_turn - self.keep_recent_turns]
+        candidates.sort(key=lambda call: estimate_tokens(messages[call[0]]), reverse=True)
+        for index, _, name, args in candidates:
+            if total <= self.token_budget:
+                break
+            before = estimate_tokens(messages[index])
+            self.stub(messages, index, name, args, "older output dropped to stay within the token budget")
+            total -= before - estimate_tokens(messages[index])
+        return total
+
+    def summary(self):
+        return f"History: {self.compacted} tool outputs compacted, ~{self.tokens_saved} tokens removed from the prompt"
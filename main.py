@@ -1,9 +1,20 @@
+# google.genai, the tool schemas and the client are imported and built on first use rather than
+# here, so the flag handling and the daemon client path start without loading them.
 import os
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
+import threading
+import time
 from sys import argv
-from functions.function_call import available_functions, function_map
+from functions.config import CACHE_DIR, tool_deadline
+from functions.output_capture import MAX_OUTPUT_BYTES
+from functions.python_pool import MAX_RUNS_PER_WORKER, POOL_SIZE
+from functions.tracing import tracer
+from context_cache import DEFAULT_TTL_SECONDS, ContextCache, clear_registry, read_pinned_files
+from daemon import DEFAULT_SOCKET
+from history import DEFAULT_TOKEN_BUDGET, HistoryManager, estimate_tokens
+from ratelimit import call_with_retry, call_with_retry_async
+from budget import WIND_DOWN_PROMPT, SessionBudget
+from routing import FAST_MODEL, Router
+from response_cache import MAX_CACHE_BYTES
 
 system_prompt = """
 You are a helpful AI coding agent.
@@ -11,9 +22,11 @@ You are a helpful AI coding agent.
 When a user asks a question or makes a request, make a function call plan. You can perform the following operations:
 
 - List files and directories
-- Read file contents  
+- Read file contents, or several files at once by path or glob  
+- Search file contents for text or a regular expression
 - Execute Python files with optional arguments
-- Write or overwrite files
+- Run the test suite in parallel, or only the tests that failed or are affected by your changes
+- Write or overwrite files, edit them with search/replace or a unified diff, or write several files at once
 
 All paths you provide should be relative to the working directory. You do not need to specify the working directory in your function calls as it is automatically injected for security reasons. The working directory is set to "./calculator".
 You can only access files and directories within the working directory. If a file or directory is outside the working directory, you should return an error message indicating that it cannot be accessed.
@@ -22,39 +35,191 @@ Firstly try to modify the existing files  If you need to create a new file, you
 When you call a function, you will receive a response that may contain either a result or an error message. If the function call is successful, return the result. If there is an error, return the error message.
 """
 
-load_dotenv()
-api_key = os.environ.get("GEMINI_API_KEY")
-client = genai.Client(api_key=api_key)
-user_prompt = str(argv[1])
+MODEL = "gemini-2.0-flash-001"
+MAX_ITERATIONS = 20
+WORKING_DIRECTORY = "./calculator"
+
+client = None
+tool_map = None
+tool_cache = None
+# Set by the batch runner so that concurrent sessions share request and token limits.
+rate_limiter = None
+context_cache = None
+# Sessions on the daemon's loop resolve the handle from worker threads at the same time.
+context_cache_lock = threading.Lock()
+response_cache = None
+prefetcher = None
+
+
+def flag_value(name, default=None):
+    """Return the value given as "--name value" or "--name=value" on the command line."""
+    for index, arg in enumerate(argv):
+        if arg.startswith(f"{name}="):
+            return arg.split("=", 1)[1]
+        if arg == name and index + 1 < len(argv):
+            return argv[index + 1]
+    return default
+
+
+user_prompt = str(argv[1]) if len(argv) > 1 else ""
 verbose = "--verbose" in argv
+parallel = "--parallel" in argv
+stream = "--stream" in argv
+persist_tool_cache = "--persist-tool-cache" in argv
+compact_history = "--no-compact" not in argv
+use_journal = "--no-journal" not in argv
+journal_diffs = "--journal-diffs" in argv
+use_prefetch = "--prefetch" in argv
+max_iterations = int(flag_value("--max-iterations", MAX_ITERATIONS))
+route_models = "--route" in argv
+fast_model = flag_value("--fast-model", FAST_MODEL)
+strong_model = flag_value("--strong-model", MODEL)
+budget_limits = {
+    "max_seconds": float(flag_value("--max-seconds", 0)) or None,
+    "max_prompt_tokens": int(flag_value("--max-prompt-tokens", 0)) or None,
+    "max_output_tokens": int(flag_value("--max-output-tokens", 0)) or None,
+    "max_tool_seconds": float(flag_value("--max-tool-seconds", 0)) or None,
+}
+history_budget = int(flag_value("--history-budget", DEFAULT_TOKEN_BUDGET))
+trace_path = flag_value("--trace")
+tracer.enabled = trace_path is not None
+record_path = flag_value("--record")
+replay_path = flag_value("--replay")
+serve = "--serve" in argv
+socket_path = flag_value("--socket", DEFAULT_SOCKET)
+batch_path = flag_value("--batch")
+pinned_files = [path for path in (flag_value("--pin") or "").split(",") if path]
+use_context_cache = ("--context-cache" in argv or bool(pinned_files)) and not replay_path
+context_cache_ttl = int(flag_value("--context-cache-ttl", DEFAULT_TTL_SECONDS))
+use_response_cache = "--cache" in argv and "--no-cache" not in argv and not replay_path
+response_cache_bytes = int(float(flag_value("--cache-max-mb", MAX_CACHE_BYTES / 1024 / 1024)) * 1024 * 1024)
+
+
+def get_client():
+    """Return the model client, creating it on first use.
+
+    --replay serves a recorded session instead of calling the API, and --record saves every
+    model turn of this run to a file that --replay can use later. --cache answers requests
+    identical to earlier ones from the on-disk response cache; recording sits outside it so
+    cached turns are recorded too.
+    """
+    global client, response_cache
+    if client is None:
+        from replay import RecordingClient, ReplayClient
+
+        if replay_path:
+            client = ReplayClient.load(replay_path)
+        else:
+            from dotenv import load_dotenv
+            from google import genai
+
+            load_dotenv()
+            client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+            if use_response_cache:
+                from functions.function_call import available_functions
+                from response_cache import CachingClient, ResponseCache
+
+                response_cache = ResponseCache(
+                    ResponseCache.prefix_key(system_prompt, [available_functions]),
+                    max_bytes=response_cache_bytes,
+                )
+                client = CachingClient(client, response_cache)
+            if record_path:
+                client = RecordingClient(client, record_path)
+    return client
+
+
+def get_tool_map():
+    """Return the cached tool functions, importing the tools and applying the flags on first use."""
+    global tool_map, tool_cache, prefetcher
+    if tool_map is None:
+        from functions.function_call import function_map
+        from functions.run_python_file import configure_output, enable_worker_pool
+        from functions.tool_cache import ToolCache
+
+        configure_output(
+            max_bytes=int(flag_value("--max-output-bytes", MAX_OUTPUT_BYTES)),
+            echo=verbose and "--live-output" in argv,
+        )
+        if "--warm-python" in argv:
+            enable_worker_pool(
+                size=int(flag_value("--python-workers", POOL_SIZE)),
+                max_runs=MAX_RUNS_PER_WORKER,
+            )
+        tool_cache = ToolCache(path=os.path.join(CACHE_DIR, "tool_cache.sqlite") if persist_tool_cache else None)
+        tool_map = tool_cache.wrap_all(function_map)
+        if use_prefetch:
+            from prefetch import Prefetcher
 
-if len(user_prompt) == 0:
-    print("Prompt content cannot be empty. Please provide a valid prompt.")
-    exit(1)
+            prefetcher = Prefetcher(tool_cache, function_map)
+    return tool_map
 
 
-def call_function(function_call_part, verbose=False):
+def start_journal(working_directory=None):
+    """Snapshot the working directory so this session's tool responses report the files changed since."""
+    if use_journal:
+        from functions.change_journal import get_journal, session_cursor
+
+        session_cursor.set(get_journal(working_directory or WORKING_DIRECTORY, journal_diffs).cursor())
+
+
+def append_changes(function_name, args, function_result):
+    """Append the session's summary of files changed since its previous tool call to a result."""
+    from functions.change_journal import get_journal, session_cursor
+    from functions.dispatch import written_paths
+
+    journal = get_journal(args["working_directory"], journal_diffs)
+    cursor = session_cursor.get()
+    if cursor is None or cursor.journal is not journal:
+        cursor = journal.default_cursor
+    # write_file already says what it wrote, so only report what else changed.
+    exclude = {os.path.normpath(path) for path in written_paths(args)} if function_name == "write_file" else set()
+    changes = cursor.changes(exclude)
+    if not changes:
+        return function_result
+    return f"{function_result}\n\n{changes}"
+
+
+def start_prefetch(messages, working_directory=None):
+    """With --prefetch, start reading the files the next turn is likely to ask for."""
+    if use_prefetch:
+        get_tool_map()
+        prefetcher.start(messages, working_directory or WORKING_DIRECTORY)
+
+
+def call_function(function_call_part, verbose=False, working_directory=None):
     """Execute a function call and return the result as Content."""
     print_func = lambda msg: print(f"Calling function: {function_call_part.name}({function_call_part.args})") if verbose else print(f" - Calling function: {function_call_part.name}")
     print_func("")
     
     function_name = function_call_part.name
+    tool_map = get_tool_map()
     
-    if function_name not in function_map:
+    if function_name not in tool_map:
         return create_tool_response(function_name, {"error": f"Unknown function: {function_name}"})
 
     args = dict(function_call_part.args)
-    args["working_directory"] = "./calculator"
+    args["working_directory"] = working_directory or WORKING_DIRECTORY
 
-    try:
-        function_result = function_map[function_name](**args)
-        return create_tool_response(function_name, {"result": function_result})
-    except Exception as e:
-        return create_tool_response(function_name, {"error": f"Function execution failed: {str(e)}"})
+    with tracer.span(f"tool:{function_name}", category="tool") as span:
+        try:
+            function_result = tool_map[function_name](**args)
+            if function_name == "write_file" and context_cache:
+                drop_stale_context_cache(args)
+            if use_journal:
+                with tracer.span("change_journal", category="io"):
+                    function_result = append_changes(function_name, args, function_result)
+            span["result_chars"] = len(str(function_result))
+            return create_tool_response(function_name, {"result": function_result})
+        except Exception as e:
+            span["error"] = str(e)
+            return create_tool_response(function_name, {"error": f"Function execution failed: {str(e)}"})
 
 
 def create_tool_response(function_name, response_data):
     """Create a tool response Content object."""
+    from google.genai import types
+
     return types.Content(
         role="tool",
         parts=[types.Part.from_function_response(name=function_name, response=response_data)]
@@ -77,6 +242,11 @@ def validate_function_response(function_call_result):
 def handle_function_call(part, verbose):
     """Handle a single function call."""
     function_call_result = call_function(part.function_call, verbose)
+    return report_function_result(function_call_result, verbose)
+
+
+def report_function_result(function_call_result, verbose):
+    """Validate and print the result of a completed function call."""
     validate_function_response(function_call_result)
     
     response_data = function_call_result.parts[0].function_response.response
@@ -96,7 +266,15 @@ def handle_function_call(part, verbose):
     return function_call_result
 
 
-def process_response_parts(candidate, verbose):
+def dispatch_function_calls(function_call_parts, verbose):
+    """Run the function calls of one candidate concurrently, returning results in part order."""
+    from functions.dispatch import run_ordered
+
+    calls = [(part.function_call.name, dict(part.function_call.args or {})) for part in function_call_parts]
+    return run_ordered(calls, lambda index: call_function(function_call_parts[index].function_call, verbose))
+
+
+def process_response_parts(candidate, verbose, parallel=False):
     """Process all parts of a response, handling both function calls and text."""
     function_called = False
     has_text = False
@@ -104,10 +282,18 @@ def process_response_parts(candidate, verbose):
     function_results = []
     
     if hasattr(candidate.content, "parts") and candidate.content.parts:
+        dispatched = []
+        if parallel:
+            function_call_parts = [part for part in candidate.content.parts if hasattr(part, "function_call") and part.function_call]
+            dispatched = dispatch_function_calls(function_call_parts, verbose)
+
         for part in candidate.content.parts:
             if hasattr(part, "function_call") and part.function_call:
                 function_called = True
-                function_result = handle_function_call(part, verbose)
+                if parallel:
+                    function_result = report_function_result(dispatched[len(function_results)], verbose)
+                else:
+                    function_result = handle_function_call(part, verbose)
                 function_results.append(function_result)
             elif hasattr(part, "text") and part.text:
                 final_response = part.text
@@ -117,26 +303,222 @@ def process_response_parts(candidate, verbose):
     return function_called, has_text, final_response, function_results
 
 
+def record_usage(span, usage):
+    """Attach token counts from usage metadata to a trace span."""
+    if usage:
+        span["prompt_tokens"] = usage.prompt_token_count or 0
+        span["output_tokens"] = usage.candidates_token_count or 0
+        span["cached_tokens"] = usage.cached_content_token_count or 0
+
+
+def finish_trace():
+    """Print the span summary and export the trace when --trace is given."""
+    if not tracer.enabled:
+        return
+    print(tracer.summary())
+    tracer.export(trace_path)
+    print(f"Trace written to {trace_path}")
+
+
+def get_cached_content():
+    """Return the context cache handle for the static prefix, or None to send it inline.
+
+    The handle is created on first use with --context-cache or --pin; if the provider refuses
+    (for instance because the prefix is below its minimum cacheable size) the run falls back
+    to sending the system prompt and tools with every request.
+    """
+    global context_cache, use_context_cache
+    with context_cache_lock:
+        if not use_context_cache:
+            return None
+        try:
+            if context_cache is None:
+                from functions.function_call import available_functions
+
+                context_cache = ContextCache(
+                    get_client(),
+                    MODEL,
+                    system_prompt,
+                    [available_functions],
+                    read_pinned_files(WORKING_DIRECTORY, pinned_files),
+                    ttl=context_cache_ttl,
+                )
+            name = context_cache.name()
+            if response_cache:
+                response_cache.add_context_key(name, context_cache.key)
+            return name
+        except Exception as e:
+            print(f"Warning: context caching unavailable, sending the prompt inline: {e}")
+            use_context_cache = False
+            return None
+
+
+def drop_stale_context_cache(args):
+    """After write_file changed a pinned file, delete the handle and rebuild it from the new contents on next use."""
+    global context_cache
+    from functions.dispatch import written_paths
+
+    if not pinned_files:
+        return
+    root = os.path.abspath(args["working_directory"])
+    written = {os.path.normpath(os.path.join(root, path)) for path in written_paths(args)}
+    pinned = {os.path.normpath(os.path.join(os.path.abspath(WORKING_DIRECTORY), path)) for path in pinned_files}
+    if written & pinned:
+        with context_cache_lock:
+            stale, context_cache = context_cache, None
+        if stale:
+            stale.delete()
+
+
+def generate_config(model=MODEL, allow_tools=True):
+    """Build the generation config for a request to model.
+
+    The context cache holds the prefix for MODEL only, so requests to other models (--route's
+    fast model, a different --strong-model) get it inline.
+    allow_tools=False keeps the tools declared but forbids calling them.
+    """
+    from google.genai import types
+    from functions.function_call import available_functions
+
+    tool_config = None
+    if not allow_tools:
+        tool_config = types.ToolConfig(function_calling_config=types.FunctionCallingConfig(mode="NONE"))
+    cached_content = get_cached_content() if model == MODEL else None
+    if cached_content:
+        return types.GenerateContentConfig(cached_content=cached_content, tool_config=tool_config)
+    return types.GenerateContentConfig(
+        tools=[available_functions],
+        system_instruction=system_prompt,
+        tool_config=tool_config,
+    )
+
+
+def request_config(model, budget):
+    """Return generate_config(model) with the request timed out at the session's wall-clock deadline."""
+    from google.genai import types
+
+    config = generate_config(model)
+    deadline = budget.deadline()
+    if deadline is not None:
+        config.http_options = types.HttpOptions(timeout=max(int((deadline - time.monotonic()) * 1000), 1000))
+    return config
+
+
+def start_session_policy():
+    """Return the model router (None without --route) and the budget for a new session."""
+    router = Router(fast_model, strong_model) if route_models else None
+    return router, SessionBudget(**budget_limits)
+
+
+def choose_model(router, messages, verbose):
+    if router is None:
+        return MODEL
+    model, reason = router.choose(messages)
+    if verbose:
+        print(f"Model: {model} ({reason})")
+    return model
+
+
+def wind_down_message(reason):
+    """Print that a budget ran out and return the message asking the model to wrap up."""
+    from google.genai import types
+
+    print(f"Budget reached: {reason}. Asking the model for a final summary.")
+    return types.Content(role="user", parts=[types.Part(text=WIND_DOWN_PROMPT.format(reason=reason))])
+
+
+def wind_down(messages, reason, budget):
+    """Once a session budget is used up, make one last request with function calling disabled."""
+    messages.append(wind_down_message(reason))
+    with tracer.span("generate_content", category="model", wind_down=True) as span:
+        response = call_with_retry(lambda: get_client().models.generate_content(
+            model=strong_model,
+            contents=messages,
+            config=generate_config(strong_model, allow_tools=False),
+        ))
+        record_usage(span, response.usage_metadata)
+    budget.add_usage(response.usage_metadata)
+    if not response.candidates or not response.candidates[0].content:
+        return None
+    messages.append(response.candidates[0].content)
+    text = "".join(part.text for part in response.candidates[0].content.parts or [] if part.text)
+    if text:
+        print(text)
+    return text or None
+
+
 def main():
+    if serve:
+        from daemon import serve_forever
+
+        exit(serve_forever(socket_path))
+
+    if "--clear-context-cache" in argv:
+        print(f"Deleted {clear_registry(get_client())} context cache handles")
+        return
+
+    if batch_path:
+        import batch
+
+        failed = batch.main(
+            batch_path,
+            flag_value("--output", "batch_results.jsonl"),
+            int(flag_value("--concurrency", batch.DEFAULT_CONCURRENCY)),
+            requests_per_minute=float(flag_value("--rpm", 0)) or None,
+            tokens_per_minute=float(flag_value("--tpm", 0)) or None,
+            verbose=verbose,
+        )
+        exit(1 if failed else 0)
+
+    if len(user_prompt) == 0:
+        print("Prompt content cannot be empty. Please provide a valid prompt.")
+        exit(1)
+
+    if stream:
+        import asyncio
+
+        asyncio.run(main_async())
+        return
+
+    from google.genai import types
+
     print("Starting the Gemini API client...")
+    start_journal()
     messages = [types.Content(role="user", parts=[types.Part(text=user_prompt)])]
     
-    max_iterations = 20
     final_response = None
+    history = HistoryManager(token_budget=history_budget)
+    router, budget = start_session_policy()
     
     for iteration in range(max_iterations):
         try:
             if verbose:
                 print(f"Iteration {iteration + 1}/{max_iterations}")
+            if compact_history:
+                history.compact(messages)
+            reason = budget.exceeded()
+            if reason:
+                final_response = wind_down(messages, reason, budget) or final_response
+                break
             
-            response = client.models.generate_content(
-                model="gemini-2.0-flash-001",
-                contents=messages,
-                config=types.GenerateContentConfig(
-                    tools=[available_functions], 
-                    system_instruction=system_prompt
-                ),
-            )
+            model = choose_model(router, messages, verbose)
+            tool_deadline.set(budget.tool_deadline())
+            start_prefetch(messages)
+            with tracer.span("generate_content", category="model", iteration=iteration + 1, model=model) as span:
+                try:
+                    response = call_with_retry(lambda: get_client().models.generate_content(
+                        model=model,
+                        contents=messages,
+                        config=request_config(model, budget),
+                    ))
+                except Exception:
+                    # Cut off by the wall-clock deadline: the next iteration asks for the summary.
+                    if not budget.exceeded():
+                        raise
+                    span["timed_out"] = True
+                    continue
+                record_usage(span, response.usage_metadata)
+            budget.add_usage(response.usage_metadata)
             
             if not response.candidates:
                 print("Error: No candidates in response")
@@ -145,7 +527,9 @@ def main():
             candidate = response.candidates[0]
             messages.append(candidate.content)
             
-            function_called, has_text, final_response, function_results = process_response_parts(candidate, verbose)
+            tools_started = time.perf_counter()
+            function_called, has_text, final_response, function_results = process_response_parts(candidate, verbose, parallel)
+            budget.add_tool_time(time.perf_counter() - tools_started)
             
             messages.extend(function_results)
             
@@ -175,6 +559,206 @@ def main():
             usage = response.usage_metadata
             print(f"Prompt tokens: {getattr(usage, 'prompt_token_count', 'N/A')}")
             print(f"Response tokens: {getattr(usage, 'candidates_token_count', 'N/A')}")
+        if tool_cache:
+            print(tool_cache.summary())
+        if context_cache:
+            print(context_cache.summary())
+        if response_cache:
+            print(response_cache.summary())
+        if prefetcher:
+            print(prefetcher.summary())
+        if compact_history:
+            print(history.summary())
+        if router:
+            print(router.summary())
+        print(budget.summary())
+    finish_trace()
+
+
+async def stream_candidate(client, messages, verbose, working_directory=None, model=MODEL, allow_tools=True, deadline=None):
+    """Stream one model turn, printing text and starting function calls as their parts arrive.
+
+    Returns the assembled candidate content, the function call tasks in part order and the
+    usage metadata of the last chunk. At the monotonic deadline, if one is given, the stream
+    is abandoned and what arrived so far is returned.
+    """
+    import asyncio
+
+    from google.genai import types
+    from functions.dispatch import AsyncDispatcher
+
+    dispatcher = AsyncDispatcher()
+    parts = []
+    tasks = []
+    usage = None
+
+    started = time.perf_counter()
+    estimated_tokens = sum(estimate_tokens(message) for message in messages)
+    # A turn that may not call tools has no next read to prepare for.
+    if allow_tools:
+        start_prefetch(messages, working_directory)
+
+    # Resolving the context cache handle may create or extend it over the network.
+    config = await asyncio.to_thread(generate_config, model, allow_tools)
+
+    async def open_stream():
+        if rate_limiter:
+            await rate_limiter.acquire(estimated_tokens)
+        return await client.aio.models.generate_content_stream(
+            model=model,
+            contents=messages,
+            config=config,
+        )
+
+    with tracer.span("generate_content", category="model", streamed=True, model=model) as span:
+        try:
+            async with asyncio.timeout(None if deadline is None else max(deadline - time.monotonic(), 0)):
+                response_stream = await call_with_retry_async(open_stream)
+                async for chunk in response_stream:
+                    if "first_chunk_ms" not in span:
+                        span["first_chunk_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                    if chunk.usage_metadata:
+                        usage = chunk.usage_metadata
+                    if not chunk.candidates or not chunk.candidates[0].content:
+                        continue
+
+                    for part in chunk.candidates[0].content.parts or []:
+                        if part.function_call and not allow_tools:
+                            continue
+                        if part.function_call:
+                            parts.append(part)
+                            function_call = part.function_call
+                            tasks.append(dispatcher.submit(
+                                function_call.name,
+                                dict(function_call.args or {}),
+                                lambda function_call=function_call: call_function(function_call, verbose, working_directory),
+                            ))
+                        elif part.text:
+                            print(part.text, end="", flush=True)
+                            if parts and parts[-1].text and not parts[-1].function_call:
+                                parts[-1] = types.Part(text=parts[-1].text + part.text)
+                            else:
+                                parts.append(types.Part(text=part.text))
+        except TimeoutError:
+            span["timed_out"] = True
+        except BaseException:
+            # Calls already started must not outlive the failed turn and run unseen.
+            await cancel_tasks(tasks)
+            raise
+        record_usage(span, usage)
+    if rate_limiter and usage:
+        rate_limiter.settle(estimated_tokens, usage.total_token_count)
+
+    if any(part.text for part in parts):
+        print()
+    return types.Content(role="model", parts=parts), tasks, usage
+
+
+async def cancel_tasks(tasks):
+    """Cancel function call tasks and wait until they have stopped."""
+    import asyncio
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_session_async(client, prompt, verbose=False, working_directory=None):
+    """Run one agent conversation on the async client and return the final text response.
+
+    Sessions share nothing but the client, so many of them can run on one event loop, each in
+    its own working directory if one is given.
+    """
+    from google.genai import types
+
+    messages = [types.Content(role="user", parts=[types.Part(text=prompt)])]
+    final_response = None
+    usage = None
+    start_journal(working_directory)
+    history = HistoryManager(token_budget=history_budget)
+    router, budget = start_session_policy()
+
+    for iteration in range(max_iterations):
+        try:
+            if verbose:
+                print(f"Iteration {iteration + 1}/{max_iterations}")
+            if compact_history:
+                history.compact(messages)
+            reason = budget.exceeded()
+            if reason:
+                messages.append(wind_down_message(reason))
+                content, _, usage = await stream_candidate(client, messages, verbose, working_directory, strong_model, allow_tools=False)
+                budget.add_usage(usage)
+                final_response = "".join(part.text for part in content.parts if part.text) or final_response
+                break
+
+            model = choose_model(router, messages, verbose)
+            tool_deadline.set(budget.tool_deadline())
+            content, tasks, usage = await stream_candidate(client, messages, verbose, working_directory, model, deadline=budget.deadline())
+            budget.add_usage(usage)
+            if not content.parts:
+                # Cut off by the wall-clock deadline: the next iteration asks for the summary.
+                if budget.exceeded():
+                    continue
+                print("Error: No function calls or text in response")
+                break
+
+            messages.append(content)
+            text = "".join(part.text for part in content.parts if part.text)
+            if text:
+                final_response = text
+
+            tools_started = time.perf_counter()
+            try:
+                for task in tasks:
+                    messages.append(report_function_result(await task, verbose))
+            except BaseException:
+                await cancel_tasks(tasks)
+                raise
+            budget.add_tool_time(time.perf_counter() - tools_started)
+
+            if not tasks:
+                if verbose:
+                    print(f"-> Conversation completed after {iteration + 1} iterations")
+                break
+
+        except Exception as e:
+            print(f"Error during iteration {iteration + 1}: {e}")
+            break
+    else:
+        print(f"Warning: Reached maximum iterations ({max_iterations}). Conversation may be incomplete.")
+        if final_response:
+            print(f"Last response: {final_response}")
+        else:
+            print("No final text response received.")
+
+    if verbose:
+        print(f"User prompt: {prompt}")
+        print(f"Completed {iteration + 1}/{max_iterations} iterations")
+        if usage:
+            print(f"Prompt tokens: {getattr(usage, 'prompt_token_count', 'N/A')}")
+            print(f"Response tokens: {getattr(usage, 'candidates_token_count', 'N/A')}")
+        if tool_cache:
+            print(tool_cache.summary())
+        if context_cache:
+            print(context_cache.summary())
+        if response_cache:
+            print(response_cache.summary())
+        if prefetcher:
+            print(prefetcher.summary())
+        if compact_history:
+            print(history.summary())
+        if router:
+            print(router.summary())
+        print(budget.summary())
+
+    return final_response
+
+
+async def main_async():
+    print("Starting the Gemini API client (streaming)...")
+    await run_session_async(get_client(), user_prompt, verbose)
+    finish_trace()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,176 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from functions.tracing import tracer
+
+MAX_PREFETCH_PER_TURN = 6
+# Files larger than this are left for the model to page through itself.
+MAX_PREFETCH_BYTES = 64 * 1024
+MAX_WORKERS = 4
+PREFETCH_EXTENSIONS = (".py", ".txt", ".md", ".json", ".toml", ".cfg", ".ini", ".yaml", ".yml")
+
+TRACEBACK_FILE = re.compile(r'File "([^"]+)", line \d+')
+LISTING_FILE = re.compile(r"^- (.+): \d+ bytes$", re.MULTILINE)
+SEARCH_FILE = re.compile(r"^([^\s:][^:]*):\d+[:-] ", re.MULTILINE)
+IMPORT = re.compile(r"^\s*(?:from\s+(\.*[\w.]*)\s+import\s+([\w, ]+)|import\s+([\w., ]+))", re.MULTILINE)
+
+
+class Prefetcher:
+    """Reads the files the model is likely to ask for next while its request is in flight.
+
+    Before each model request the last turn's tool results are scanned for files worth
+    reading: those named in a traceback, imported by a file that was just read, matched by
+    a search, or listed in a directory listing, in that order. Their get_file_content
+    results are put in the tool cache on worker threads, so a matching call is a cache hit.
+    Prefetched entries nobody asked for by the end of the session are counted as waste.
+    """
+
+    def __init__(self, tool_cache, function_map, max_per_turn=MAX_PREFETCH_PER_TURN):
+        self.tool_cache = tool_cache
+        self.read = function_map["get_file_content"]
+        self.max_per_turn = max_per_turn
+        self.executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="prefetch")
+        self.lock = threading.Lock()
+        # key -> (bytes, seconds) for prefetched entries not yet asked for
+        self.pending = {}
+        # Keys being read right now; finished reads are found with tool_cache.contains.
+        self.in_flight = set()
+        self.prefetched = 0
+        self.hits = 0
+        self.saved_seconds = 0.0
+        tool_cache.on_hit = self.claim
+
+    def last_turn_results(self, messages):
+        """Return (function name, args, result text) for the tool calls of the last model turn."""
+        for index in range(len(messages) - 1, -1, -1):
+            if messages[index].role == "model":
+                break
+        else:
+            return []
+        calls = [
+            (part.function_call.name, dict(part.function_call.args or {}))
+            for part in messages[index].parts or []
+            if part.function_call
+        ]
+        results = []
+        for (name, args), content in zip(calls, messages[index + 1:]):
+            response = content.parts[0].function_response.response if content.parts else None
+            if isinstance(response, dict):
+                results.append((name, args, str(response.get("result") or response.get("error") or "")))
+        return results
+
+    def predict(self, messages, root):
+        """Return working-directory-relative paths to prefetch, most likely first."""
+        tracebacks, imports, searches, listings = [], [], [], []
+        for name, args, text in self.last_turn_results(messages):
+            for path in TRACEBACK_FILE.findall(text):
+                path = os.path.abspath(path)
+                if path.startswith(root + os.sep):
+                    tracebacks.append(path[len(root) + 1:])
+            if name == "get_file_content" and args.get("file_path"):
+                imports.extend(self.imported_files(root, args["file_path"], text))
+            elif name == "search_files":
+                directory = args.get("directory") or ""
+                searches.extend(os.path.join(directory, path) for path in SEARCH_FILE.findall(text))
+            elif name == "get_files_info":
+                directory = args.get("directory") or ""
+                listings.extend(os.path.join(directory, path) for path in LISTING_FILE.findall(text))
+
+        paths = []
+        for path in tracebacks + imports + searches + listings:
+            path = os.path.normpath(path)
+            if path not in paths and path.endswith(PREFETCH_EXTENSIONS) and not path.startswith(".."):
+                paths.append(path)
+        return paths
+
+    @staticmethod
+    def imported_files(root, file_path, text):
+        """Resolve the imports in text to files that exist under root."""
+        package = os.path.dirname(os.path.normpath(file_path))
+        files = []
+        for match in IMPORT.finditer(text):
+            source, names, modules = match.groups()
+            starts = ["", package]
+            if modules:
+                stems = [module.strip().replace(".", "/") for module in modules.split(",") if module.strip()]
+            else:
+                base = source.lstrip(".")
+                level = len(source) - len(base)
+                stem = base.replace(".", "/")
+                # "from pkg import render" may name a submodule rather than an attribute.
+                stems = ([stem] if stem else []) + [os.path.join(stem, name.strip()) for name in names.split(",") if name.strip()]
+                if level:
+                    start = package
+                    for _ in range(level - 1):
+                        start = os.path.dirname(start)
+                    starts = [start]
+            for stem in stems:
+                for start in starts:
+                    found = [
+                        os.path.normpath(os.path.join(start, path))
+                        for path in (f"{stem}.py", os.path.join(stem, "__init__.py"))
+                        if os.path.isfile(os.path.join(root, start, path))
+                    ]
+                    if found:
+                        files.append(found[0])
+                        break
+        return files
+
+    def start(self, messages, working_directory):
+        """Queue prefetches for the next turn; returns at once so the model request can go out."""
+        root = os.path.abspath(working_directory)
+        queued = 0
+        for path in self.predict(messages, root):
+            if queued >= self.max_per_turn:
+                break
+            full_path = os.path.join(root, path)
+            try:
+                if os.path.getsize(full_path) > MAX_PREFETCH_BYTES:
+                    continue
+            except OSError:
+                continue
+            args = {"file_path": path}
+            key, target = self.tool_cache.key(working_directory, "get_file_content", args)
+            with self.lock:
+                if key is None or key in self.in_flight or self.tool_cache.contains(key):
+                    continue
+                self.in_flight.add(key)
+            self.executor.submit(self.warm, working_directory, key, target, args)
+            queued += 1
+
+    def warm(self, working_directory, key, target, args):
+        started = time.perf_counter()
+        try:
+            result = self.read(working_directory, **args)
+            if not isinstance(result, str) or result.startswith("Error"):
+                return
+            self.tool_cache.put(key, "get_file_content", target, result)
+            with self.lock:
+                self.pending[key] = (len(result), time.perf_counter() - started)
+                self.prefetched += 1
+        finally:
+            with self.lock:
+                self.in_flight.discard(key)
+
+    def claim(self, key):
+        """Called by the tool cache on every hit; counts hits on prefetched entries."""
+        with self.lock:
+            entry = self.pending.pop(key, None)
+            if entry is not None:
+                self.hits += 1
+                self.saved_seconds += entry[1]
+        if entry is not None:
+            tracer.record(prefetch_hits=1)
+
+    def summary(self):
+        with self.lock:
+            wasted_bytes = sum(size for size, _ in self.pending.values())
+            wasted_ms = sum(seconds for _, seconds in self.pending.values()) * 1000
+            rate = f"{self.hits / self.prefetched:.0%}" if self.prefetched else "n/a"
+            return (
+                f"Prefetch: {self.hits} of {self.prefetched} prefetched files used (hit rate {rate}, {self.saved_seconds * 1000:.1f} ms of reads saved), "
+                f"{len(self.pending)} wasted ({wasted_bytes} chars read, {wasted_ms:.1f} ms of worker time)"
+            )
@@ -0,0 +1,109 @@
+import asyncio
+import random
+import time
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+
+
+def is_retryable(error):
+    """True for rate limit and server errors from the API and for dropped connections."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return getattr(error, "code", None) in RETRYABLE_STATUS_CODES
+
+
+def retry_delay(error, attempt):
+    """Seconds to wait before retry number attempt: the server's Retry-After or full-jitter backoff."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return min(float(headers.get("retry-after")), MAX_DELAY)
+    except (TypeError, ValueError):
+        return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+
+
+def call_with_retry(request, max_retries=MAX_RETRIES):
+    """Call request(), retrying retryable errors with backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            return request()
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = retry_delay(e, attempt)
+            print(f"Model request failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+async def call_with_retry_async(request, max_retries=MAX_RETRIES):
+    """Await request(), retrying retryable errors with backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            return await request()
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = retry_delay(e, attempt)
+            print(f"Model request failed ({e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+class TokenBucket:
+    """Allows rate_per_minute units per minute, refilled continuously, with a one-minute burst.
+
+    A take may overdraw the bucket (a request larger than the burst, or actual usage reported
+    after the fact); later takes then wait until it has refilled.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.rate = rate_per_minute / 60
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        self.refill()
+        return max(min(amount, self.capacity) - self.tokens, 0) / self.rate
+
+    def take(self, amount):
+        self.refill()
+        self.tokens -= amount
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits shared by the sessions of one event loop."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.lock = asyncio.Lock()
+        self.waited = 0.0
+
+    async def acquire(self, estimated_tokens):
+        """Wait until one request of about estimated_tokens tokens fits both limits, then take it."""
+        async with self.lock:
+            while True:
+                delay = max(
+                    self.requests.wait_time(1) if self.requests else 0,
+                    self.tokens.wait_time(estimated_tokens) if self.tokens else 0,
+                )
+                if delay <= 0:
+                    break
+                self.waited += delay
+                await asyncio.sleep(delay)
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(estimated_tokens)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Charge the difference between the estimate and the usage the API reported."""
+        if self.tokens and actual_tokens:
+            self.tokens.take(actual_tokens - estimated_tokens)
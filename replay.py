@@ -0,0 +1,132 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from google.genai import types
+
+
+def dump_response(response):
+    return response.model_dump(mode="json", exclude_none=True)
+
+
+def merge_chunks(chunks):
+    """Combine streamed chunks into one response, as the blocking API would have returned it."""
+    if len(chunks) == 1:
+        return chunks[0]
+    parts = []
+    for chunk in chunks:
+        if not chunk.candidates or not chunk.candidates[0].content:
+            continue
+        for part in chunk.candidates[0].content.parts or []:
+            if part.text and parts and parts[-1].text and not parts[-1].function_call:
+                parts[-1] = types.Part(text=parts[-1].text + part.text)
+            else:
+                parts.append(part)
+    usage = next((chunk.usage_metadata for chunk in reversed(chunks) if chunk.usage_metadata), None)
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=parts))],
+        usage_metadata=usage,
+    )
+
+
+class _Recorder:
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def save(self, chunks):
+        self.file.write(json.dumps({"chunks": [dump_response(chunk) for chunk in chunks]}) + "\n")
+        self.file.flush()
+
+
+class _RecordingModels:
+    def __init__(self, models, recorder):
+        self.models = models
+        self.recorder = recorder
+
+    def generate_content(self, **kwargs):
+        response = self.models.generate_content(**kwargs)
+        self.recorder.save([response])
+        return response
+
+
+class _RecordingAsyncModels:
+    def __init__(self, models, recorder):
+        self.models = models
+        self.recorder = recorder
+
+    async def generate_content_stream(self, **kwargs):
+        response_stream = await self.models.generate_content_stream(**kwargs)
+
+        async def recorded():
+            chunks = []
+            async for chunk in response_stream:
+                chunks.append(chunk)
+                yield chunk
+            self.recorder.save(chunks)
+
+        return recorded()
+
+
+class RecordingClient:
+    """Wraps a genai.Client and appends every model turn to a JSONL session file."""
+
+    def __init__(self, client, path):
+        recorder = _Recorder(path)
+        self.models = _RecordingModels(client.models, recorder)
+        self.aio = SimpleNamespace(models=_RecordingAsyncModels(client.aio.models, recorder))
+        self.caches = client.caches
+
+
+class _ReplayModels:
+    def __init__(self, replay):
+        self.replay = replay
+
+    def generate_content(self, **kwargs):
+        return merge_chunks(self.replay.next_turn())
+
+
+class _ReplayAsyncModels:
+    def __init__(self, replay):
+        self.replay = replay
+
+    async def generate_content_stream(self, **kwargs):
+        chunks = self.replay.next_turn(sleep=False)
+        await asyncio.sleep(self.replay.latency)
+
+        async def replayed():
+            for chunk in chunks:
+                yield chunk
+
+        return replayed()
+
+
+class ReplayClient:
+    """Stands in for genai.Client, returning the turns of a recorded session in order.
+
+    Works with both the blocking and the streaming loop whichever one recorded the session.
+    latency adds a fixed delay per turn to imitate model time in benchmarks.
+    """
+
+    def __init__(self, turns, latency=0.0):
+        self.turns = list(turns)
+        self.latency = latency
+        self.models = _ReplayModels(self)
+        self.aio = SimpleNamespace(models=_ReplayAsyncModels(self))
+
+    @classmethod
+    def load(cls, path, latency=0.0):
+        turns = []
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    chunks = json.loads(line)["chunks"]
+                    turns.append([types.GenerateContentResponse.model_validate(chunk) for chunk in chunks])
+        return cls(turns, latency)
+
+    def next_turn(self, sleep=True):
+        if not self.turns:
+            raise RuntimeError("Replay session has no more recorded turns")
+        if sleep and self.latency:
+            time.sleep(self.latency)
+        return self.turns.pop(0)
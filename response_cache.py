@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+from functions.config import CACHE_DIR
+from functions.tracing import tracer
+
+CACHE_PATH = os.path.join(CACHE_DIR, "responses.sqlite")
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+# The request timeout follows the session budget and doesn't change what the model is asked.
+# The context cache handle is keyed by the prefix it stands for (see ResponseCache.key).
+UNKEYED_CONFIG = {"cached_content", "http_options"}
+
+
+def _dump(value):
+    return value.model_dump(mode="json", exclude_none=True)
+
+
+class ResponseCache:
+    """On-disk cache of model responses keyed by a hash of the full request.
+
+    The key covers the model, the static prefix (system prompt and tool declarations), the
+    rest of the generation config and every message so far, so a hit means the model was
+    asked exactly the same thing before. A request using a context cache handle is keyed by
+    the hash of what the handle holds, pinned files included, as registered with
+    add_context_key; an unregistered handle is keyed by its name. Entries are stored as the list of response chunks,
+    like a recorded session, and the least recently used are evicted once the stored
+    responses exceed max_bytes.
+    """
+
+    def __init__(self, prefix, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.context_keys = {}
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, chunks TEXT, size INTEGER, last_used REAL)"
+        )
+        self.db.commit()
+
+    @staticmethod
+    def prefix_key(system_prompt, tools):
+        digest = hashlib.sha256(system_prompt.encode())
+        for tool in tools:
+            digest.update(json.dumps(_dump(tool), sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def add_context_key(self, name, key):
+        """Record that the context cache handle name holds the prefix hashed as key."""
+        self.context_keys[name] = key
+
+    def key(self, model, contents, config):
+        config = _dump(config) if config else {}
+        handle = config.get("cached_content")
+        context = self.context_keys.get(handle, handle)
+        config = {name: value for name, value in config.items() if name not in UNKEYED_CONFIG}
+        payload = json.dumps(
+            [self.prefix, context, model, config, [_dump(content) for content in contents]],
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """Return the stored chunk dumps for key, or None.
+
+        Usage metadata is left out: answering from the cache bills no tokens, so a hit must
+        not count against the session budget or the rate limiter.
+        """
+        with self.lock:
+            row = self.db.execute("SELECT chunks FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                tracer.record(response_cache_misses=1)
+                return None
+            self.hits += 1
+            tracer.record(response_cache_hits=1)
+            self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        chunks = json.loads(row[0])
+        for chunk in chunks:
+            chunk.pop("usage_metadata", None)
+        return chunks
+
+    def put(self, key, chunks):
+        if not any(chunk.candidates for chunk in chunks):
+            return
+        data = json.dumps([_dump(chunk) for chunk in chunks])
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS total FROM responses) "
+                "WHERE total > ?)",
+                (self.max_bytes,),
+            )
+            self.db.commit()
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = f"{self.hits / total:.0%}" if total else "n/a"
+        with self.lock:
+            entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return f"Response cache: {self.hits} hits, {self.misses} misses (hit rate {rate}), {entries} responses stored ({size / 1024 / 1024:.1f} MB)"
+
+
+class _CachingModels:
+    def __init__(self, models, cache):
+        self.models = models
+        self.cache = cache
+
+    def generate_content(self, **kwargs):
+        from replay import merge_chunks
+        from google.genai import types
+
+        key = self.cache.key(kwargs["model"], kwargs["contents"], kwargs.get("config"))
+        stored = self.cache.get(key)
+        if stored is not None:
+            return merge_chunks([types.GenerateContentResponse.model_validate(chunk) for chunk in stored])
+        response = self.models.generate_content(**kwargs)
+        self.cache.put(key, [response])
+        return response
+
+
+class _CachingAsyncModels:
+    def __init__(self, models, cache):
+        self.models = models
+        self.cache = cache
+
+    async def generate_content_stream(self, **kwargs):
+        from google.genai import types
+
+        key = self.cache.key(kwargs["model"], kwargs["contents"], kwargs.get("config"))
+        stored = self.cache.get(key)
+        if stored is not None:
+            chunks = [types.GenerateContentResponse.model_validate(chunk) for chunk in stored]
+
+            async def replayed():
+                for chunk in chunks:
+                    yield chunk
+
+            return replayed()
+
+        response_stream = await self.models.generate_content_stream(**kwargs)
+
+        async def recorded():
+            chunks = []
+            async for chunk in response_stream:
+                chunks.append(chunk)
+                yield chunk
+            self.cache.put(key, chunks)
+
+        return recorded()
+
+
+class CachingClient:
+    """Wraps a genai.Client so identical requests are answered from a ResponseCache."""
+
+    def __init__(self, client, cache):
+        self.cache = cache
+        self.models = _CachingModels(client.models, cache)
+        self.aio = SimpleNamespace(models=_CachingAsyncModels(client.aio.models, cache))
+        self.caches = client.caches
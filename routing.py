@@ -0,0 +1,53 @@
+import re
+from collections import Counter
+
+from history import estimate_tokens
+
+FAST_MODEL = "gemini-2.0-flash-lite-001"
+# Above this many estimated history tokens every turn goes to the strong model.
+STRONG_HISTORY_TOKENS = 16000
+FAILURE = re.compile(r"\AError|Traceback \(most recent call last\)|^(?:FAILED|ERROR) ", re.MULTILINE)
+
+
+class Router:
+    """Picks the model for each turn from cheap signals about the conversation so far.
+
+    The strong model plans the first turn, handles the turn after a tool failed (an error
+    result, a traceback or failing tests) and takes over once the history is long. Routine
+    steps after tools that succeeded go to the fast model.
+    """
+
+    def __init__(self, fast_model, strong_model, strong_history_tokens=STRONG_HISTORY_TOKENS):
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.strong_history_tokens = strong_history_tokens
+        self.turns = Counter()
+
+    @staticmethod
+    def last_results(messages):
+        """Return the result texts of the tool calls made since the last model turn."""
+        results = []
+        for content in reversed(messages):
+            if content.role == "model":
+                break
+            for part in content.parts or []:
+                response = part.function_response.response if part.function_response else None
+                if isinstance(response, dict):
+                    results.append(str(response.get("error") or response.get("result") or ""))
+        return results
+
+    def choose(self, messages):
+        """Return (model, reason) for the next request."""
+        if not any(content.role == "model" for content in messages):
+            model, reason = self.strong_model, "first turn"
+        elif any(FAILURE.search(result) for result in self.last_results(messages)):
+            model, reason = self.strong_model, "last tool call failed"
+        elif sum(estimate_tokens(content) for content in messages) > self.strong_history_tokens:
+            model, reason = self.strong_model, "long history"
+        else:
+            model, reason = self.fast_model, "routine tool step"
+        self.turns[model] += 1
+        return model, reason
+
+    def summary(self):
+        return "Routing: " + ", ".join(f"{count} turns on {model}" for model, count in self.turns.items())
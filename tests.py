@@ -1,7 +1,20 @@
+import os
+import tempfile
+
+from google.genai import types
+
+from budget import SessionBudget
+from functions.tool_cache import ToolCache
+from prefetch import Prefetcher
+from routing import Router
 from functions.get_files_info import get_files_info
 from functions.get_file_content import get_file_content
+from functions.read_files import read_files
 from functions.write_file import write_file
 from functions.run_python_file import run_python_file
+from functions.search_files import search_files
+from functions.run_tests import run_tests
+from functions.file_index import required_literals
 
 
 def main():
@@ -67,6 +80,118 @@ def main():
     print('Test 16: run_python_file("calculator", "nonexistent.py")')
     print(run_python_file("calculator", "nonexistent.py"))
 
+    print('Test 17: get_file_content("calculator", "main.py", offset=4, limit=3)')
+    print(get_file_content("calculator", "main.py", offset=4, limit=3), end="\n\n")
+
+    print('Test 18: get_file_content("calculator", "tests.py", offset=10, limit=40, unit="bytes")')
+    print(get_file_content("calculator", "tests.py", offset=10, limit=40, unit="bytes"), end="\n\n")
+
+    print('Test 19: get_files_info("calculator", recursive=True, include=["*.py"])')
+    print(get_files_info("calculator", recursive=True, include=["*.py"]), end="\n\n")
+
+    print('Test 20: search_files("calculator", "def evaluate")')
+    print(search_files("calculator", "def evaluate"), end="\n\n")
+
+    print(r'Test 21: search_files("calculator", r"self\.\w+\[", regex=True, context=1)')
+    print(search_files("calculator", r"self\.\w+\[", regex=True, context=1), end="\n\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "notes.txt"), "w", newline="") as file:
+            file.write("alpha\r\nbeta\r\ngamma\r\n")
+
+        print('Test 22: write_file(<dir>, "notes.txt", mode="edit", edits=[{"search": "beta", "replace": "BETA"}])')
+        print(write_file(directory, "notes.txt", mode="edit", edits=[{"search": "beta", "replace": "BETA"}]))
+        print(repr(open(os.path.join(directory, "notes.txt"), newline="").read()), end="\n\n")
+
+        diff = "@@ -2,2 +2,3 @@\n BETA\n+delta\n gamma\n\n"
+        print(f'Test 22b: write_file(<dir>, "notes.txt", mode="edit", diff={diff!r})')
+        print(write_file(directory, "notes.txt", mode="edit", diff=diff))
+        print(repr(open(os.path.join(directory, "notes.txt"), newline="").read()), end="\n\n")
+
+        files = [{"file_path": "a.txt", "content": "a\n"}, {"file_path": "sub/b.txt", "content": "b\n"}]
+        print(f'Test 22c: write_file(<dir>, files={files!r})')
+        print(write_file(directory, files=files))
+        print(sorted(os.listdir(directory)), sorted(os.listdir(os.path.join(directory, "sub"))), end="\n\n")
+
+        umask = os.umask(0)
+        os.umask(umask)
+        print("Test 22d: mode of a new file written by write_file matches 0o666 & ~umask")
+        print(oct(os.stat(os.path.join(directory, "a.txt")).st_mode & 0o777) == oct(0o666 & ~umask), end="\n\n")
+
+        diff = "--- a/a.txt\n+++ b/a.txt\n@@ -1 +1 @@\n-a\n+A\n--- a/notes.txt\n+++ b/notes.txt\n@@ -1 +1 @@\n-alpha\n+ALPHA\n"
+        print(f'Test 22e: write_file(<dir>, "a.txt", mode="edit", diff={diff!r}) and write_file(<dir>, files=[{{"content": "x"}}])')
+        print(write_file(directory, "a.txt", mode="edit", diff=diff))
+        print(write_file(directory, files=[{"content": "x"}]), end="\n\n")
+
+    print('Test 23: run_tests("calculator")')
+    print(run_tests("calculator"), end="\n\n")
+
+    print('Test 24: run_tests("calculator", only_failed=True)')
+    print(run_tests("calculator", only_failed=True), end="\n\n")
+
+    print('Test 25: read_files("calculator", ["pkg/*.py", "main.py"], max_bytes=2000)')
+    print(read_files("calculator", ["pkg/*.py", "main.py"], max_bytes=2000), end="\n\n")
+
+    print('Test 26: read_files("calculator", ["../main.py", "missing.py"])')
+    print(read_files("calculator", ["../main.py", "missing.py"]), end="\n\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "test_subtests.py"), "w") as file:
+            file.write(
+                "import unittest\n\n\n"
+                "class TestSubTests(unittest.TestCase):\n"
+                "    def test_values(self):\n"
+                "        for value in (1, 2, 3):\n"
+                "            with self.subTest(value=value):\n"
+                "                self.assertNotEqual(value, 2)\n"
+            )
+        print('Test 27: run_tests(<dir with a failing subtest>, framework="unittest")')
+        print(run_tests(directory, framework="unittest"), end="\n\n")
+
+    router = Router("fast", "strong")
+    prompt = types.Content(role="user", parts=[types.Part(text="fix the tests")])
+    call = types.Content(role="model", parts=[types.Part.from_function_call(name="run_tests", args={})])
+    passed = types.Content(role="tool", parts=[types.Part.from_function_response(name="run_tests", response={"result": "Ran 3 tests: 3 passed"})])
+    failed = types.Content(role="tool", parts=[types.Part.from_function_response(name="run_tests", response={"result": "FAILED test_a"})])
+    print("Test 28: Router.choose on the first turn, after a passing tool call and after a failing one")
+    print(router.choose([prompt]), router.choose([prompt, call, passed]), router.choose([prompt, call, failed]), end="\n\n")
+
+    budget = SessionBudget(max_prompt_tokens=100, max_tool_seconds=5)
+    print("Test 29: SessionBudget.exceeded before and after its limits are reached")
+    print(budget.exceeded())
+    budget.add_usage(types.GenerateContentResponseUsageMetadata(prompt_token_count=60, candidates_token_count=10))
+    budget.add_tool_time(6)
+    print(budget.exceeded())
+    budget.add_usage(types.GenerateContentResponseUsageMetadata(prompt_token_count=60, candidates_token_count=10))
+    print(budget.exceeded(), end="\n\n")
+
+    tool_cache = ToolCache()
+    prefetcher = Prefetcher(tool_cache, {"get_file_content": get_file_content})
+    cached_read = tool_cache.wrap("get_file_content", get_file_content)
+    read = types.Content(role="model", parts=[types.Part.from_function_call(name="get_file_content", args={"file_path": "main.py"})])
+    source = types.Content(role="tool", parts=[types.Part.from_function_response(name="get_file_content", response={"result": get_file_content("calculator", "main.py")})])
+    print('Test 30: Prefetcher.predict after reading calculator/main.py')
+    print(prefetcher.predict([prompt, read, source], os.path.abspath("calculator")), end="\n\n")
+
+    prefetcher.start([prompt, read, source], "calculator")
+    prefetcher.executor.shutdown(wait=True)
+    cached_read("calculator", file_path="pkg/render.py", offset=0, unit="lines")
+    print("Test 31: prefetch hits and waste after one of the prefetched files is read")
+    print(f"{prefetcher.hits} used, {len(prefetcher.pending)} wasted of {prefetcher.prefetched} prefetched; {tool_cache.summary()}", end="\n\n")
+
+    print(r'Test 32: required_literals for r"function_\d+5\(", r"abc|def" and r"(?x)a b c d"')
+    print(required_literals(r"function_\d+5\("), required_literals(r"abc|def"), required_literals(r"(?x)a b c d"), end="\n\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.symlink(os.path.join(directory, "missing.py"), os.path.join(directory, "broken.py"))
+        with open(os.path.join(directory, "main.py"), "w") as file:
+            file.write("print()\n")
+        print("Test 33: get_files_info(<dir with a broken symlink>)")
+        print(get_files_info(directory), end="\n\n")
+
+    print('Test 34: get_file_content("calculator", "main.py", limit=0)')
+    print(get_file_content("calculator", "main.py", limit=0), end="\n\n")
+
 
 if __name__ == "__main__":
     main()